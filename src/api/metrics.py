@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from cache.metrics import registry
+
+router = APIRouter()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@router.get(
+    '/metrics',
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+)
+async def metrics() -> PlainTextResponse:
+    """Метрики воркера в текстовом формате Prometheus."""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Query, Request
+
+from .schemes import CacheInvalidation, CacheInvalidationResult, HotCategory, HotItem, HotItems
+from cache.hot_calls import hot_calls, top
+from cache.tags import entity_tags, publish
+from core.auth import user_role_required
+from db import redis
+
+router = APIRouter()
+
+
+@router.post(
+    "/cache/invalidate",
+    response_model=CacheInvalidationResult,
+    summary='Инвалидация кэша',
+    description='Удаление из кэша всех записей, содержащих указанные фильмы, персоны и жанры'
+)
+@user_role_required('admin')
+async def invalidate_cache(
+        changed: CacheInvalidation,
+        request: Request,
+) -> CacheInvalidationResult:
+    tags = entity_tags(changed.films, changed.persons, changed.genres)
+    message_id = await publish(redis.redis, tags) if tags else ''
+    return CacheInvalidationResult(message_id=message_id, tags=len(tags))
+
+
+@router.get(
+    "/cache/hot",
+    response_model=HotItems,
+    summary='Самые частые обращения',
+    description='Самые частые вызовы, ключи кэша, запросы, сущности и поисковые строки по данным всех воркеров'
+)
+@user_role_required('admin')
+async def hot_items(
+        request: Request,
+        category: HotCategory = HotCategory.keys,
+        limit: int = Query(default=20, ge=1, le=1000),
+) -> HotItems:
+    # Свежие счетчики этого воркера, остальные сбрасываются по расписанию
+    await hot_calls.flush(redis.redis)
+    items = await top(redis.redis, category.value, limit)
+    return HotItems(
+        category=category,
+        results=[HotItem(item=item, count=count) for item, count in items],
+    )
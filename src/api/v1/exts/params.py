@@ -1,4 +1,5 @@
 import binascii
+from uuid import UUID
 
 from fastapi import Depends, HTTPException, Query
 from orjson import JSONDecodeError
@@ -29,3 +30,25 @@ class PaginatedParams:
                 self.search_after = film_service.b64decode_sync(self.page_next)
             except (binascii.Error, JSONDecodeError):
                 raise HTTPException(status_code=422, detail="page[next] not valid")
+
+
+MAX_BATCH_IDS = 100
+
+
+class BatchIds:
+    def __init__(self,
+                 ids: list[str] | None = Query(
+                     default=None,
+                     description=f"Список id (повторяющийся параметр или через запятую, не более {MAX_BATCH_IDS}), "
+                                 "при использовании игнорируются остальные параметры"
+                 ),
+            ):
+        self.ids = None
+        if ids is None:
+            return
+        try:
+            self.ids = [UUID(node_id) for value in ids for node_id in value.split(',') if node_id]
+        except ValueError:
+            raise HTTPException(status_code=422, detail="ids not valid")
+        if not self.ids or len(self.ids) > MAX_BATCH_IDS:
+            raise HTTPException(status_code=422, detail=f"from 1 to {MAX_BATCH_IDS} ids expected")
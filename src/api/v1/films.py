@@ -1,13 +1,15 @@
 from http import HTTPStatus
+from typing import Union
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 
-from .exts.params import PaginatedParams
-from .schemes import FilmDetails, FilmsList, FilmsSorting
+from .exts.params import BatchIds, PaginatedParams
+from .schemes import FilmBatchItem, FilmDetails, FilmsBatch, FilmsList, FilmsSorting
+from cache.response_cache import CachedRoute
 from services.film import FilmService, get_film_service
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 @router.get(
@@ -49,17 +51,28 @@ async def film_details(
 
 @router.get(
     "",
-    response_model=FilmsList,
+    response_model=Union[FilmsList, FilmsBatch],
     summary='Список фильмов',
-    description='Список фильмов по жанрам с поддержкой пагинации'
+    description='Список фильмов по жанрам с поддержкой пагинации или фильмы по списку ids'
 )
 async def get_films(
         sort: FilmsSorting | None = None,
         filter_genre: UUID | None = Query(default=None, alias="filter[genre]"),
         page_size: int = Query(default=10, alias="page[size]", ge=10, le=100),
         pages: PaginatedParams = Depends(),
+        batch: BatchIds = Depends(),
         film_service: FilmService = Depends(get_film_service),
-) -> FilmsList:
+) -> FilmsList | FilmsBatch:
+
+    if batch.ids is not None:
+        films = await film_service.get_by_ids(batch.ids)
+        return FilmsBatch(
+            found=sum(film is not None for film in films),
+            results=[
+                FilmBatchItem(id=film_id, found=film is not None, film=film and FilmDetails(**dict(film)))
+                for film_id, film in zip(batch.ids, films)
+            ],
+        )
 
     movies = await film_service.get_films(sort=sort, search_after=pages.search_after, filter_genre=filter_genre,
                                           size=page_size, page_number=pages.page_number)
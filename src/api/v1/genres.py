@@ -1,12 +1,15 @@
 from http import HTTPStatus
+from typing import Union
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 
-from .schemes import GenreDetails, GenresList
+from .exts.params import BatchIds
+from .schemes import GenreBatchItem, GenreDetails, GenresBatch, GenresList
+from cache.response_cache import CachedRoute
 from services.genre import GenreService, get_genre_service
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 @router.get(
@@ -28,15 +31,26 @@ async def get_genre_details(
 
 @router.get(
     "",
-    response_model=GenresList,
+    response_model=Union[GenresList, GenresBatch],
     summary='Список жанров',
-    description='Список жанров с поддержкой пагинации'
+    description='Список жанров с поддержкой пагинации или жанры по списку ids'
 )
 async def get_genres(
     page_size: int = Query(default=10, alias="page[size]", ge=10, le=100),
     page_number: int = Query(default=1, alias="page[number]", ge=1),
+    batch: BatchIds = Depends(),
     genre_service: GenreService = Depends(get_genre_service),
-) -> GenresList:
+) -> GenresList | GenresBatch:
+    if batch.ids is not None:
+        genres = await genre_service.get_by_ids(batch.ids)
+        return GenresBatch(
+            found=sum(genre is not None for genre in genres),
+            results=[
+                GenreBatchItem(id=genre_id, found=genre is not None, genre=genre and GenreDetails(**dict(genre)))
+                for genre_id, genre in zip(batch.ids, genres)
+            ],
+        )
+
     genres = await genre_service.get_genres(size=page_size, page_number=page_number)
     if not genres:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="genre not found")
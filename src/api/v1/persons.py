@@ -1,15 +1,18 @@
 import binascii
 from http import HTTPStatus
+from typing import Union
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from orjson import JSONDecodeError
 
-from .exts.params import PaginatedParams
-from .schemes import FilmsResult, PersonDetails, PersonsResult
+from .exts.params import BatchIds, PaginatedParams
+from .schemes import (FilmsResult, Person, PersonBatchItem, PersonDetails,
+                      PersonsBatch, PersonsResult)
+from cache.response_cache import CachedRoute
 from services.person import PersonService, get_person_service
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 @router.get(
@@ -75,15 +78,26 @@ async def get_person_details(
 
 @router.get(
     "",
-    response_model=PersonsResult,
+    response_model=Union[PersonsResult, PersonsBatch],
     summary='Поиск персоны',
-    description='Нечеткий поиск, выдает список персон с поддержкой пагинации'
+    description='Нечеткий поиск, выдает список персон с поддержкой пагинации или персон по списку ids (без ролей)'
 )
 async def get_persons(
     page_size: int = Query(default=50, ge=10, le=100, alias="page[size]"),
     pages: PaginatedParams = Depends(),
+    batch: BatchIds = Depends(),
     person_service: PersonService = Depends(get_person_service),
 ):
+    if batch.ids is not None:
+        # Роли требуют отдельного поиска по фильмам для каждой персоны
+        persons = await person_service.get_by_ids(batch.ids)
+        return PersonsBatch(
+            found=sum(person is not None for person in persons),
+            results=[
+                PersonBatchItem(id=person_id, found=person is not None, person=person and Person(**dict(person)))
+                for person_id, person in zip(batch.ids, persons)
+            ],
+        )
 
     persons = await person_service.get_persons(size=page_size,
                                                page_number=pages.page_number, search_after=pages.search_after)
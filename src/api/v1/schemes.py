@@ -19,6 +19,17 @@ class GenresList(Node):
     results: list[Genre]
 
 
+class GenreBatchItem(Node):
+    id: UUID
+    found: bool
+    genre: GenreDetails | None = None
+
+
+class GenresBatch(Node):
+    found: int
+    results: list[GenreBatchItem]
+
+
 class Roles(Node):
     actor: list[UUID]
     writer: list[UUID]
@@ -40,6 +51,17 @@ class PersonsResult(Node):
     results: list[Person]
 
 
+class PersonBatchItem(Node):
+    id: UUID
+    found: bool
+    person: Person | None = None
+
+
+class PersonsBatch(Node):
+    found: int
+    results: list[PersonBatchItem]
+
+
 class Film(Node):
     id: str
     title: str
@@ -61,6 +83,17 @@ class FilmsList(Node):
     results: list[Film]
 
 
+class FilmBatchItem(Node):
+    id: UUID
+    found: bool
+    film: FilmDetails | None = None
+
+
+class FilmsBatch(Node):
+    found: int
+    results: list[FilmBatchItem]
+
+
 class FilmsResult(Node):
     count: int
     results: list[Film]
@@ -69,3 +102,34 @@ class FilmsResult(Node):
 class FilmsSorting(str, Enum):
     asc = "imdb_rating"
     desc = "-imdb_rating"
+
+
+class CacheInvalidation(Node):
+    films: list[UUID] = []
+    persons: list[UUID] = []
+    genres: list[UUID] = []
+
+
+class CacheInvalidationResult(Node):
+    message_id: str
+    tags: int
+
+
+class HotCategory(str, Enum):
+    calls = 'calls'
+    keys = 'keys'
+    requests = 'requests'
+    films = 'films'
+    persons = 'persons'
+    genres = 'genres'
+    searches = 'searches'
+
+
+class HotItem(Node):
+    item: str
+    count: float
+
+
+class HotItems(Node):
+    category: HotCategory
+    results: list[HotItem]
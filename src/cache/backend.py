@@ -0,0 +1,82 @@
+"""Redis backend fastapi-cache с пакетными операциями. Вместо N
+последовательных обращений к Redis - одно: чтение через MGET, запись через
+pipeline из SET с собственным TTL для каждого ключа.
+
+"""
+import asyncio
+import time
+from typing import Iterable, Optional
+
+from fastapi_cache.backends.redis import RedisBackend
+from redis.exceptions import RedisError
+
+# Ошибки и таймауты Redis не должны ломать запрос: работаем без кэша
+BACKEND_ERRORS = (ConnectionError, RedisError, asyncio.TimeoutError)
+
+
+# Рядом с записью с адаптивным временем жизни хранится абсолютный срок ее
+# жизни (unix time): продление не должно держать популярный ключ вечно
+DEADLINE_SUFFIX = ':deadline'
+
+# Чтение значения с продлением TTL на ARGV[1] секунд, но не дольше ARGV[2] и
+# не позже срока из KEYS[2]. Без срока (запись сделана до его появления)
+# запись не продлевается. ARGV[3] - текущее время.
+GET_EXTEND_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if value then
+    local deadline = tonumber(redis.call('GET', KEYS[2]))
+    local ttl = redis.call('TTL', KEYS[1])
+    if deadline and ttl >= 0 then
+        local step = tonumber(ARGV[1])
+        local max_expire = tonumber(ARGV[2])
+        local expire = math.min(ttl + step, max_expire, deadline - tonumber(ARGV[3]))
+        if expire > ttl then
+            redis.call('EXPIRE', KEYS[1], expire)
+        end
+    end
+end
+return value
+"""
+
+
+def deadline_key(key: str) -> str:
+    return f"{key}{DEADLINE_SUFFIX}"
+
+
+class RedisBatchBackend(RedisBackend):
+    def __init__(self, redis):
+        super().__init__(redis)
+        self._get_extend = redis.register_script(GET_EXTEND_SCRIPT)
+
+    async def get_extend(self, key: str, step: int, max_expire: int) -> Optional[bytes]:
+        """
+        Чтение значения с продлением его времени жизни за один запрос.
+        Общее время жизни записи ограничено сроком, сохраненным при ее записи
+        (см. deadline_key и cache.write_behind.write_entries).
+
+        :param key: Ключ кэша.
+        :param step: На сколько секунд продлить запись.
+        :param max_expire: Максимальное оставшееся время жизни записи.
+        :return: Значение или None.
+        """
+        return await self._get_extend(
+            keys=[key, deadline_key(key)], args=[step, max_expire, int(time.time())]
+        )
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        """
+        :param keys: Ключи кэша.
+        :return: Значения в порядке keys, None для отсутствующих.
+        """
+        if not keys:
+            return []
+        return await self.redis.mget(keys)
+
+    async def set_many(self, items: Iterable[tuple[str, bytes, Optional[int]]]):
+        """
+        :param items: Тройки (ключ, значение, время жизни).
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value, expire in items:
+                pipe.set(key, value, ex=expire)
+            await pipe.execute()
@@ -1,8 +1,12 @@
+import lz4.frame as lz4
 import orjson
+import zstandard as zstd
 from fastapi_cache.coder import Coder
 from pydantic import BaseModel
 from starlette.responses import JSONResponse
 
+from core.config import settings
+
 
 def default(obj):
     if isinstance(obj, BaseModel):
@@ -22,4 +26,66 @@ class JsonCoder(Coder):
 
     @classmethod
     def decode(cls, value: ...) -> ...:
-        return orjson.loads(value)
\ No newline at end of file
+        return orjson.loads(value)
+
+
+def default_dict(obj):
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    raise TypeError
+
+
+class BinaryCoder(Coder):
+    """Кодирование в bytes без промежуточных строк. Работает с Redis, который
+    возвращает сырые bytes (decode_responses=False).
+
+    Формат значения: байт заголовка + тело. Старшие 4 бита заголовка - версия
+    формата, младшие - алгоритм сжатия. Тело - JSON (orjson), сжатое, если
+    его размер не меньше settings.cache_coder.compress_min_size.
+
+    Значения без заголовка (записанные JsonCoder) читаются как обычный JSON.
+
+    """
+    VERSION = 1
+    RAW = 0
+    LZ4 = 1
+    ZSTD = 2
+
+    compression = settings.cache_coder.compression
+    compress_min_size = settings.cache_coder.compress_min_size
+    zstd_level = settings.cache_coder.zstd_level
+
+    @classmethod
+    def _codec(cls) -> int:
+        return {'lz4': cls.LZ4, 'zstd': cls.ZSTD}.get(cls.compression, cls.RAW)
+
+    @classmethod
+    def encode(cls, value: ...) -> bytes:
+        body = orjson.dumps(value, default=default_dict)
+
+        codec = cls.RAW
+        if len(body) >= cls.compress_min_size:
+            codec = cls._codec()
+            if codec == cls.LZ4:
+                body = lz4.compress(body)
+            elif codec == cls.ZSTD:
+                body = zstd.ZstdCompressor(level=cls.zstd_level).compress(body)
+
+        return bytes(((cls.VERSION << 4) | codec,)) + body
+
+    @classmethod
+    def decode(cls, value: bytes | str) -> ...:
+        if isinstance(value, str):
+            return orjson.loads(value)
+
+        header = value[0]
+        if header >> 4 != cls.VERSION:
+            return orjson.loads(value)
+
+        codec = header & 0x0F
+        body = memoryview(value)[1:]
+        if codec == cls.LZ4:
+            body = lz4.decompress(body)
+        elif codec == cls.ZSTD:
+            body = zstd.ZstdDecompressor().decompress(body)
+        return orjson.loads(body)
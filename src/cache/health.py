@@ -0,0 +1,150 @@
+"""Состояние Redis как уровня кэша. Медленный Redis хуже недоступного:
+каждый запрос ждет его ответа. Поэтому время и ошибки обращений к Redis
+учитываются в скользящем окне, и при превышении порогов
+(settings.cache_health) кэш на время cooldown обходится - запросы идут
+сразу в БД. По истечении cooldown один запрос пробует Redis снова: при
+успехе кэш включается, при ошибке обход продлевается.
+
+Среднее время считается только по чтениям: запись больших значений
+pipeline (write-through, write-behind) законно дольше и не должна
+отключать кэш. Ошибки учитываются для всех обращений.
+
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Optional, TypeVar
+
+from cache.backend import BACKEND_ERRORS
+from cache.metrics import Counter, Gauge, registry
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CacheHealth:
+    def __init__(self):
+        self.state = CLOSED
+        self.samples: deque[tuple[Optional[float], bool]] = deque()
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.errors = 0
+        self.open_until = 0.0
+        self.probe_until = 0.0
+
+    @property
+    def bypassed(self) -> bool:
+        """Кэш обходится (без смены состояния)."""
+        return self.state != CLOSED
+
+    def available(self) -> bool:
+        """
+        Можно ли обращаться к Redis. В состоянии half-open разрешает ровно
+        одно пробное обращение на cooldown.
+
+        :return: False, если кэш нужно обойти.
+        """
+        if self.state == CLOSED or not settings.cache_health.enabled:
+            return True
+
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now < self.open_until:
+                return False
+            self.state = HALF_OPEN
+        if now < self.probe_until:
+            return False
+        self.probe_until = now + settings.cache_health.cooldown
+        return True
+
+    def record(self, latency: Optional[float], error: bool = False):
+        """
+        Учет обращения к Redis.
+
+        :param latency: Время обращения в секундах, None - не учитывать время.
+        :param error: Обращение завершилось ошибкой или таймаутом.
+        """
+        config = settings.cache_health
+        if not config.enabled:
+            return
+
+        if self.state != CLOSED:
+            # Результат пробного обращения (или запоздавших обычных)
+            if error or (latency is not None and latency >= config.latency_threshold):
+                self.trip()
+            elif self.state == HALF_OPEN:
+                self.state = CLOSED
+                logger.warning('Cache is available again, bypass is off')
+            return
+
+        self.samples.append((latency, error))
+        if latency is not None:
+            self.latency_sum += latency
+            self.latency_count += 1
+        self.errors += error
+        if len(self.samples) > config.window:
+            old_latency, old_error = self.samples.popleft()
+            if old_latency is not None:
+                self.latency_sum -= old_latency
+                self.latency_count -= 1
+            self.errors -= old_error
+
+        count = len(self.samples)
+        if count >= config.min_samples and self.errors / count >= config.error_ratio:
+            self.trip()
+        elif (
+                self.latency_count >= config.min_samples
+                and self.latency_sum / self.latency_count >= config.latency_threshold
+        ):
+            self.trip()
+
+    def trip(self):
+        if self.state == CLOSED:
+            logger.warning(
+                'Cache is bypassed for %ss: %s errors, %.4fs mean latency of %s calls',
+                settings.cache_health.cooldown, self.errors,
+                self.latency_sum / max(self.latency_count, 1), len(self.samples),
+            )
+            cache_bypass_trips.inc()
+        self.state = OPEN
+        self.open_until = time.monotonic() + settings.cache_health.cooldown
+        self.probe_until = 0.0
+        self.samples.clear()
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.errors = 0
+
+    async def call(self, awaitable: Awaitable[T], timeout: float, timed: bool = True) -> T:
+        """
+        Обращение к Redis с таймаутом и учетом результата.
+
+        :param awaitable: Корутина обращения к Redis.
+        :param timeout: Таймаут в секундах.
+        :param timed: Учитывать время обращения в среднем (False для записей).
+        :return: Результат обращения.
+        :raises: asyncio.TimeoutError и ошибки Redis (BACKEND_ERRORS).
+        """
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(awaitable, timeout)
+        except BACKEND_ERRORS:
+            self.record(time.perf_counter() - start if timed else None, error=True)
+            raise
+        self.record(time.perf_counter() - start if timed else None)
+        return result
+
+
+cache_health = CacheHealth()
+
+cache_bypass = registry.register(Gauge(
+    'cache_bypass', 'Cache is bypassed because Redis is slow or failing (1 - bypassed)',
+    function=lambda: int(cache_health.bypassed),
+))
+cache_bypass_trips = registry.register(Counter(
+    'cache_bypass_trips_total', 'Times the cache was switched to bypass mode'
+)).labels()
@@ -0,0 +1,145 @@
+"""Учет самых частых обращений: вызовов кэшируемых методов сервисов, ключей
+кэша, запросов к API, фильмов, персон, жанров и поисковых запросов. По
+списку вызовов работает прогрев кэша (cache.warmup), остальное показывает
+admin ручка /cache/hot и помогает настраивать TTL (settings.cache_ttl).
+
+Каждый воркер считает элементы по категориям в памяти алгоритмом
+Space-Saving (cache.topk) и раз в settings.hot_keys.interval секунд
+сбрасывает счетчики в Redis в сортированное множество категории за текущий
+интервал - так воркеры объединяют свои данные. Горячими считаются элементы
+за текущий и предыдущий интервалы.
+
+Вызов описывается строкой JSON: [имя класса.метода, аргументы].
+
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable
+
+import orjson
+from redis.asyncio.client import Redis
+
+from cache.backend import BACKEND_ERRORS
+from cache.key_builder import SKIP_PARAMS, canonical
+from cache.topk import SpaceSaving
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HOT_KEY = 'cache:hot'
+
+CALLS = 'calls'
+
+# Вызовы прогрева кэша (cache.warmup) не учитываются в горячих и не продлевают
+# время жизни записей: иначе прогрев сам поддерживал бы свой список и ключи
+warming: ContextVar[bool] = ContextVar('warming', default=False)
+CATEGORIES = (CALLS, 'keys', 'requests', 'films', 'persons', 'genres', 'searches')
+
+
+class HotCalls:
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.sketches = {category: SpaceSaving(capacity) for category in CATEGORIES}
+
+    def add(self, category: str, item: str):
+        """
+        :param category: Категория из CATEGORIES.
+        :param item: Элемент, пр. ключ кэша или id фильма.
+        """
+        self.sketches[category].add(item)
+
+    def record(self, func: Callable, params: dict):
+        """
+        :param func: Метод сервиса (до декорирования).
+        :param params: Аргументы вызова (исходные: по ним вызов повторяется
+            при прогреве).
+        """
+        # Вложенные функции (пр. get_by_id) повторить снаружи нельзя
+        if '<locals>' in func.__qualname__:
+            return
+
+        call = orjson.dumps(
+            [
+                func.__qualname__,
+                {
+                    name: value
+                    for name, value in canonical(params).items()
+                    if name not in SKIP_PARAMS and value is not None
+                },
+            ],
+            option=orjson.OPT_SORT_KEYS,
+        )
+        self.sketches[CALLS].add(call)
+
+    async def flush(self, redis: Redis):
+        """Сброс накопленных счетчиков в Redis."""
+        sketches = {
+            category: sketch for category, sketch in self.sketches.items() if len(sketch)
+        }
+        if not sketches:
+            return
+        self.sketches = {category: SpaceSaving(self.capacity) for category in CATEGORIES}
+
+        expire = settings.hot_keys.interval * 2 + 60
+        async with redis.pipeline(transaction=False) as pipe:
+            for category, sketch in sketches.items():
+                key = _interval_key(category, 0)
+                for item, count in sketch.counts.items():
+                    pipe.zincrby(key, count, item)
+                pipe.expire(key, expire)
+            await pipe.execute()
+
+    async def run_periodic(self, redis: Redis):
+        """Задача воркера: сброс счетчиков каждые settings.hot_keys.interval
+        секунд.
+
+        """
+        while True:
+            await asyncio.sleep(settings.hot_keys.interval)
+            try:
+                await self.flush(redis)
+            except BACKEND_ERRORS as e:
+                logger.warning('Hot keys flush error: %r', e)
+
+
+def _interval_key(category: str, shift: int) -> str:
+    interval = max(settings.hot_keys.interval, 1)
+    return f"{HOT_KEY}:{category}:{int(time.time()) // interval - shift}"
+
+
+async def top(redis: Redis, category: str, limit: int) -> list[tuple[str, float]]:
+    """
+    Самые частые элементы категории за текущий и предыдущий интервалы по
+    данным всех воркеров.
+
+    :param redis: Подключение к Redis.
+    :param category: Категория из CATEGORIES.
+    :param limit: Количество элементов.
+    :return: Пары (элемент, количество обращений).
+    """
+    merged = Counter()
+    async with redis.pipeline(transaction=False) as pipe:
+        for shift in (0, 1):
+            pipe.zrevrange(_interval_key(category, shift), 0, limit - 1, withscores=True)
+        for items in await pipe.execute():
+            for item, score in items:
+                merged[item.decode() if isinstance(item, bytes) else item] += score
+
+    return merged.most_common(limit)
+
+
+async def top_calls(redis: Redis, limit: int) -> list[tuple[str, dict]]:
+    """
+    Самые частые вызовы методов сервисов.
+
+    :param redis: Подключение к Redis.
+    :param limit: Количество вызовов.
+    :return: Список пар (имя класса.метода, аргументы).
+    """
+    return [tuple(orjson.loads(call)) for call, _ in await top(redis, CALLS, limit)]
+
+
+hot_calls = HotCalls(capacity=settings.hot_keys.capacity)
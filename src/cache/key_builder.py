@@ -1,8 +1,106 @@
-from typing import Callable, Optional
+import hashlib
+import inspect
+from enum import Enum
+from typing import Any, Callable, Optional
+from uuid import UUID
 
+import orjson
+from pydantic import BaseModel
 from starlette.requests import Request
 from starlette.responses import Response
 
+from core.config import settings
+
+# Параметры, которые не влияют на результат вызова
+SKIP_PARAMS = {'self', 'cls'}
+
+_signatures: dict[Any, inspect.Signature] = {}
+
+
+def bind_arguments(func: Callable, args: tuple, kwargs: dict) -> inspect.BoundArguments:
+    """
+    Сопоставление аргументов вызова с параметрами функции, с учетом значений
+    по умолчанию. Сигнатура кэшируется по объекту кода, поэтому вложенные
+    функции, создаваемые на каждый вызов, не разбираются заново.
+
+    :param func: Функция.
+    :param args: Позиционные аргументы.
+    :param kwargs: Именованные аргументы.
+    :return: inspect.BoundArguments.
+    """
+    code = getattr(func, '__code__', func)
+    signature = _signatures.get(code)
+    if signature is None:
+        signature = _signatures[code] = inspect.signature(func)
+
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return bound
+
+
+# Операторы query_string (см. add_search_condition) чувствительны к регистру
+SEARCH_OPERATORS = {'AND', 'OR', 'NOT', 'TO'}
+
+
+def _normalize_search(search: str) -> str:
+    words = []
+    for word in search.split():
+        # Операторы, поля (title:...) и регулярные выражения оставляем как есть
+        if word not in SEARCH_OPERATORS and ':' not in word and '/' not in word:
+            word = word.lower()
+        words.append(word)
+    return ' '.join(words)
+
+
+def normalize_params(params: dict) -> dict:
+    """
+    Приведение аргументов сервисных методов к каноническому виду для ключа
+    кэша. pydantic_cache применяет его к копии аргументов: в БД уходит
+    исходный запрос.
+
+    - строка поиска приводится к нижнему регистру, лишние пробелы убираются
+      (Elastic все равно анализирует текст без учета регистра), кроме
+      операторов query_string (AND, OR, NOT, TO), полей и регулярных
+      выражений;
+    - при наличии search_after номер страницы не используется (см.
+      AbstractQuery._validate_body), поэтому сбрасываем его в 1.
+
+    :param params: Словарь аргументов (изменяется на месте).
+    :return: Тот же словарь.
+    """
+    search = params.get('search')
+    if isinstance(search, str):
+        params['search'] = _normalize_search(search)
+
+    if params.get('search_after') and 'page_number' in params:
+        params['page_number'] = 1
+
+    return params
+
+
+def canonical(value: Any) -> Any:
+    """
+    Представление значения для ключа кэша: пустые строки и None
+    эквивалентны, UUID и Enum превращаются в строки, классы - в полное имя.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, Enum):
+        return canonical(value.value)
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    if isinstance(value, BaseModel):
+        return canonical(value.dict())
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [canonical(v) for v in value]
+    return repr(value)
+
 
 async def key_builder(
         func: Callable,
@@ -13,14 +111,30 @@ async def key_builder(
         kwargs: Optional[dict] = None,
 ) -> str:
     """
-    Сборщик ключа для кэша. Отличается от стандартного билдера fastapi-cache отсутствием хеширования ключа.
+    Сборщик ключа для кэша. Ключ состоит из читаемого префикса
+    (prefix:namespace:module:function) и канонического JSON с аргументами
+    вызова, отсортированными по имени. Аргументы со значением None не
+    включаются. Если JSON длиннее settings.cache_key_max_length, вместо него
+    используется его хеш (blake2b).
 
     """
     from fastapi_cache import FastAPICache
 
+    params = bind_arguments(func, args or (), kwargs or {}).arguments
+    payload = orjson.dumps(
+        {
+            name: value
+            for name, value in canonical(params).items()
+            if name not in SKIP_PARAMS and value is not None
+        },
+        option=orjson.OPT_SORT_KEYS,
+    )
+    if len(payload) > settings.cache_key_max_length:
+        payload = hashlib.blake2b(payload, digest_size=16).hexdigest().encode()
+
     prefix = f"{FastAPICache.get_prefix()}:{namespace}:"
     cache_key = (
             prefix
-            + f"{func.__module__}:{func.__name__}:{args}:{kwargs}"
+            + f"{func.__module__}:{func.__name__}:{payload.decode()}"
     )
     return cache_key
@@ -0,0 +1,116 @@
+"""Локальный (in-process) уровень кэша - L1. Живет внутри каждого воркера
+и хранит уже собранные pydantic объекты, поэтому попадание в L1 не требует
+ни похода в Redis, ни декодирования JSON, ни валидации модели.
+
+Размер ограничен как количеством записей, так и суммарным объемом в байтах
+(считаем по размеру закодированного значения). Вытеснение - по TTL и LRU.
+
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+# Отличаем промах от закэшированного None
+MISSING = object()
+
+
+class LocalCache:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        """
+        :param max_entries: Максимальное количество записей.
+        :param max_bytes: Максимальный суммарный объем записей в байтах.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: OrderedDict[str, tuple[Any, int, float]] = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        # Наружу отдаем поверхностные копии, иначе изменения, сделанные
+        # вызывающим кодом (пр. person.roles = ...), попадут в кэш
+        if isinstance(value, BaseModel):
+            return value.copy()
+        return value
+
+    def get(self, key: str) -> Any:
+        """
+        Получение значения из кэша.
+
+        :param key: Ключ кэша.
+        :return: Копия объекта или MISSING, если ключа нет или он устарел.
+        """
+        item = self._data.get(key)
+        if item is None:
+            return MISSING
+
+        value, _, expire_at = item
+        if expire_at <= time.monotonic():
+            self.delete(key)
+            return MISSING
+
+        self._data.move_to_end(key)
+        return self._copy(value)
+
+    def set(self, key: str, value: Any, size: int, expire: int):
+        """
+        Сохранение значения в кэш.
+
+        :param key: Ключ кэша.
+        :param value: Pydantic объект (или None).
+        :param size: Размер значения в байтах.
+        :param expire: Время жизни записи в секундах.
+        """
+        if size > self.max_bytes or expire <= 0:
+            return
+
+        self.delete(key)
+        self._data[key] = (self._copy(value), size, time.monotonic() + expire)
+        self.size += size
+        self._evict()
+
+    def delete(self, key: str):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def clear(self):
+        self._data.clear()
+        self.size = 0
+
+    def _evict(self):
+        """Вытесняем самые старые по использованию записи, пока не уложимся в
+        ограничения. Записи с истекшим TTL удаляются при обращении к ним либо
+        здесь, по мере продвижения по LRU списку.
+
+        """
+        while len(self._data) > self.max_entries or self.size > self.max_bytes:
+            _, (_, size, _) = self._data.popitem(last=False)
+            self.size -= size
+
+
+class CacheStats:
+    """Счетчики попаданий по уровням кэша в рамках одного воркера."""
+
+    def __init__(self):
+        self.local_hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+
+    def report(self) -> dict:
+        total = self.local_hits + self.remote_hits + self.misses
+        return {
+            'requests': total,
+            'l1_hit_ratio': round(self.local_hits / total, 4) if total else 0.0,
+            'l2_hit_ratio': round(self.remote_hits / total, 4) if total else 0.0,
+            'miss_ratio': round(self.misses / total, 4) if total else 0.0,
+        }
+
+
+local_cache: Optional[LocalCache] = None
+stats = CacheStats()
@@ -0,0 +1,266 @@
+"""Метрики кэша в памяти воркера: счетчики и гистограммы с метками
+namespace и function для каждого метода, обернутого pydantic_cache.
+
+Реестр отдается в текстовом формате Prometheus ручкой /metrics (api.metrics).
+Каждый воркер gunicorn держит свой реестр, поэтому метрики воркеров
+различаются меткой instance при сборе.
+
+"""
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+# Границы корзин гистограмм
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+class HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Metric(ABC):
+    kind = ''
+
+    def __init__(self, name: str, documentation: str):
+        """
+        :param name: Имя метрики.
+        :param documentation: Описание для HELP.
+        """
+        self.name = name
+        self.documentation = documentation
+
+    def _header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    @abstractmethod
+    def collect(self) -> list[str]:
+        """Строки метрики в текстовом формате Prometheus."""
+
+
+class LabeledMetric(Metric):
+    """Метрика с дочерними метриками для каждого набора значений меток."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        """
+        :param name: Имя метрики.
+        :param documentation: Описание для HELP.
+        :param labelnames: Имена меток.
+        """
+        super().__init__(name, documentation)
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], object] = {}
+
+    @abstractmethod
+    def _new_child(self):
+        """Новая дочерняя метрика."""
+
+    @abstractmethod
+    def _samples(self, values: tuple[str, ...], child) -> list[str]:
+        """Строки дочерней метрики с метками values."""
+
+    def labels(self, *values: str):
+        """Дочерняя метрика для набора значений меток. Результат можно
+        сохранить и использовать повторно, не тратя время на поиск.
+
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def collect(self) -> list[str]:
+        lines = self._header()
+        for values, child in self._children.items():
+            lines.extend(self._samples(values, child))
+        return lines
+
+
+class Counter(LabeledMetric):
+    kind = 'counter'
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def _samples(self, values: tuple[str, ...], child: CounterChild) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Gauge(Metric):
+    """Метрика без меток (и без labels) с текущим значением."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None):
+        """
+        :param function: Функция, вычисляющая значение при сборе метрик.
+        """
+        super().__init__(name, documentation)
+        self.value = 0
+        self.function = function
+
+    def collect(self) -> list[str]:
+        value = self.function() if self.function is not None else self.value
+        return self._header() + [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(LabeledMetric):
+    kind = 'histogram'
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+    def _samples(self, values: tuple[str, ...], child: HistogramChild) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else _format_value(bound)
+            bucket_labels = _format_labels(self.labelnames, values, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+CACHE_LABELS = ('namespace', 'function')
+
+cache_hits = registry.register(Counter(
+    'cache_hits_total', 'Cache hits by level (l1 - worker memory, shm - host shared memory, l2 - Redis)', CACHE_LABELS + ('level',)
+))
+cache_misses = registry.register(Counter(
+    'cache_misses_total', 'Cache misses', CACHE_LABELS
+))
+cache_stale_hits = registry.register(Counter(
+    'cache_stale_hits_total', 'Stale values returned while revalidating in background', CACHE_LABELS
+))
+cache_bypassed = registry.register(Counter(
+    'cache_bypassed_total', 'Calls that skipped Redis while the cache was bypassed', CACHE_LABELS
+))
+cache_stale_if_error = registry.register(Counter(
+    'cache_stale_if_error_total', 'Stale shadow copies returned because the database failed', CACHE_LABELS
+))
+cache_errors = registry.register(Counter(
+    'cache_errors_total', 'Cache backend errors by operation', CACHE_LABELS + ('operation',)
+))
+cache_backend_seconds = registry.register(Histogram(
+    'cache_backend_seconds', 'Cache backend call latency', CACHE_LABELS + ('operation',)
+))
+cache_decode_seconds = registry.register(Histogram(
+    'cache_decode_seconds', 'Cached value decode and model parse time', CACHE_LABELS
+))
+cache_value_bytes = registry.register(Histogram(
+    'cache_value_bytes', 'Encoded cache value size', CACHE_LABELS, buckets=SIZE_BUCKETS
+))
+
+cache_write_behind_queue = registry.register(Gauge(
+    'cache_write_behind_queue', 'Values waiting in the write-behind queue'
+))
+cache_write_behind_dropped = registry.register(Counter(
+    'cache_write_behind_dropped_total', 'Values not cached because the write-behind queue was full'
+)).labels()
+
+
+class CacheMetrics:
+    """Дочерние метрики одного метода, создаются один раз при декорировании."""
+
+    def __init__(self, namespace: str, function: str):
+        labels = (namespace or '', function)
+        self.l1_hits = cache_hits.labels(*labels, 'l1')
+        self.shm_hits = cache_hits.labels(*labels, 'shm')
+        self.l2_hits = cache_hits.labels(*labels, 'l2')
+        self.misses = cache_misses.labels(*labels)
+        self.bypassed = cache_bypassed.labels(*labels)
+        self.stale_hits = cache_stale_hits.labels(*labels)
+        self.stale_if_error = cache_stale_if_error.labels(*labels)
+        self.get_errors = cache_errors.labels(*labels, 'get')
+        self.set_errors = cache_errors.labels(*labels, 'set')
+        self.lock_errors = cache_errors.labels(*labels, 'lock')
+        self.get_seconds = cache_backend_seconds.labels(*labels, 'get')
+        self.set_seconds = cache_backend_seconds.labels(*labels, 'set')
+        self.decode_seconds = cache_decode_seconds.labels(*labels)
+        self.value_bytes = cache_value_bytes.labels(*labels)
@@ -0,0 +1,92 @@
+"""Упреждающая загрузка следующей страницы. Клиенты списков обычно идут по
+курсору next, и каждая страница при промахе стоит запроса в Elastic. После
+ответа на страницу N фоновая задача вычисляет страницу N+1 с полученным
+search_after и кладет ее в кэш под тем ключом, с которым придет следующий
+запрос.
+
+Подключается аргументом prefetch в pydantic_cache. Упреждающие запросы
+ограничены корзиной токенов (settings.prefetch.rate и burst), количеством
+одновременных упреждающих запросов и пропускаются под нагрузкой: при
+большом количестве обрабатываемых запросов и при обходе кэша (cache.health).
+
+"""
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from cache.health import cache_health
+from cache import stale
+from cache.metrics import Counter, registry
+from cache.tags import request_keys
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Выполняется упреждающий запрос
+prefetching: ContextVar[bool] = ContextVar('prefetching', default=False)
+
+
+class Prefetcher:
+    def __init__(self):
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.inflight = 0
+        # Запросы к API, обрабатываемые воркером (считает CachedRoute)
+        self.active_requests = 0
+        self.tasks: set[asyncio.Task] = set()
+
+    def allow(self) -> bool:
+        """Можно ли сейчас запустить упреждающий запрос. Забирает токен."""
+        config = settings.prefetch
+        if not config.enabled or prefetching.get():
+            return False
+        if (
+            cache_health.bypassed
+            or self.inflight >= config.max_inflight
+            or self.active_requests > config.max_active_requests
+        ):
+            cache_prefetch_skipped_load.inc()
+            return False
+
+        now = time.monotonic()
+        self.tokens = min(config.burst, self.tokens + (now - self.updated) * config.rate)
+        self.updated = now
+        if self.tokens < 1:
+            cache_prefetch_skipped_rate.inc()
+            return False
+        self.tokens -= 1
+        return True
+
+    def schedule(self, func: Callable[[], Awaitable[Any]]):
+        """Запуск упреждающего запроса в фоне."""
+        task = asyncio.create_task(self._run(func))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        cache_prefetch_scheduled.inc()
+
+    async def _run(self, func: Callable[[], Awaitable[Any]]):
+        prefetching.set(True)
+        # Ключи следующей страницы не относятся к ответу текущего запроса, и
+        # теневая копия, отданная упреждающему вызову, не делает его
+        # устаревшим
+        request_keys.set(None)
+        stale.stale_mark.set(None)
+        self.inflight += 1
+        try:
+            await func()
+        except Exception as e:
+            logger.debug('Prefetch failed: %r', e)
+        finally:
+            self.inflight -= 1
+
+
+prefetcher = Prefetcher()
+
+cache_prefetch = registry.register(Counter(
+    'cache_prefetch_total', 'Next page prefetches by result', ('result',)
+))
+cache_prefetch_scheduled = cache_prefetch.labels('scheduled')
+cache_prefetch_skipped_rate = cache_prefetch.labels('skipped_rate')
+cache_prefetch_skipped_load = cache_prefetch.labels('skipped_load')
@@ -1,11 +1,36 @@
+import asyncio
 import inspect
+import logging
+import time
 from functools import wraps
-from typing import Any, Callable, Optional, Type
+from typing import Any, Awaitable, Callable, Optional, Type
 
 from fastapi_cache import FastAPICache
 from fastapi_cache.coder import Coder
 from pydantic import BaseModel
 
+from cache import local, shared
+from cache.backend import BACKEND_ERRORS
+from cache.health import cache_health
+from cache.hot_calls import hot_calls, warming
+from cache.key_builder import SKIP_PARAMS, bind_arguments, normalize_params
+from cache.metrics import CacheMetrics
+from cache.prefetch import prefetcher, prefetching
+from cache.single_flight import RedisLock, single_flight
+from cache.stale import get_stale, mark_stale
+from cache.tags import track_key
+from cache.write_behind import PendingWrite, write_behind, write_entries
+from core.config import settings
+from db_managers.abstract_manager import DBManagerError
+
+logger = logging.getLogger(__name__)
+
+
+async def _build_key(key_builder: Callable, func: Callable, namespace: str, args: tuple, kwargs: dict) -> str:
+    if inspect.iscoroutinefunction(key_builder):
+        return await key_builder(func, namespace, args=args, kwargs=kwargs)
+    return key_builder(func, namespace, args=args, kwargs=kwargs)
+
 
 def pydantic_cache(
         model: Type[BaseModel],
@@ -13,19 +38,89 @@ def pydantic_cache(
         coder: Optional[Type[Coder]] = None,
         key_builder: Optional[Callable[..., Any]] = None,
         namespace: Optional[str] = "",
+        local_cache: bool = False,
+        local_expire: Optional[int] = None,
+        shared_cache: Optional[bool] = None,
+        lock: Optional[bool] = None,
+        soft_expire: Optional[int] = None,
+        hard_expire: Optional[int] = None,
+        normalize: Optional[Callable[[dict], Any]] = normalize_params,
+        prefetch: Optional[Callable[[dict, Any], Optional[dict]]] = None,
 ):
     """
     Декоратор для кэширования через fastapi-cache.
     Возвращает результат в виде Pydantic объекта или None.
 
+    Одновременные промахи по одному ключу внутри воркера объединяются в один
+    вызов func. При включенной блокировке (lock) то же самое делается и между
+    воркерами через Redis.
+
+    При включенном settings.cache_write_behind свежие значения записываются
+    в Redis в фоне (см. cache.write_behind).
+
+    При включенном settings.stale_if_error рядом с записью хранится ее
+    долгоживущая теневая копия. Если при промахе func падает с
+    DBManagerError, возвращается копия, а ответ помечается как устаревший
+    (см. cache.stale).
+
+    Обращения к Redis ограничены таймаутами settings.cache_health. Если Redis
+    медленный или недоступен, кэш временно обходится (см. cache.health).
+
+    Попадания, промахи, ошибки Redis, время обращения к Redis и декодирования
+    и размер значений учитываются в cache.metrics с метками namespace и
+    function.
+
+    Время жизни записей можно переопределить политиками settings.cache_ttl
+    по имени метода или пространству имен. Записи с адаптивной политикой
+    продлеваются при каждом попадании, так популярные ключи живут дольше,
+    а разовые (пр. поисковые запросы) быстро вытесняются. Общее время жизни
+    такой записи все равно не больше max_expire политики: иначе в
+    популярном поиске не появились бы новые фильмы.
+
+    Если указан soft_expire, включается режим stale-while-revalidate: запись
+    живет в Redis hard_expire секунд, но по истечении soft_expire считается
+    устаревшей. Устаревшее значение сразу отдается вызывающему, а обновление
+    выполняется в фоне. Возраст записи вычисляется по ее оставшемуся TTL.
+
+    У обернутой функции есть метод get_many для пакетного получения значений
+    по нескольким наборам аргументов (см. ниже).
+
     :param model: Pydantic класс для возвращаемого объекта.
     :param expire: Время жизни кэша.
     :param coder: Класс для кодирования кэша.
     :param key_builder: Функция построения ключа для кэша.
     :param namespace: Пространство имен для ключа кэша.
+    :param local_cache: Использовать локальный кэш воркера (L1) перед Redis.
+    :param local_expire: Время жизни записи в L1, не больше expire.
+    :param shared_cache: Использовать общий для воркеров кэш в разделяемой
+        памяти между L1 и Redis, по умолчанию settings.shared_cache.enabled.
+    :param lock: Блокировка в Redis на время пересчета ключа, по умолчанию
+        берется из settings.cache_lock.enabled.
+    :param soft_expire: Время, после которого запись обновляется в фоне.
+    :param hard_expire: Время жизни записи в Redis в режиме
+        stale-while-revalidate, по умолчанию settings.cache_swr.hard_expire.
+    :param normalize: Функция приведения аргументов к каноническому виду,
+        получает словарь аргументов и изменяет его на месте. Изменения
+        применяются только к ключу кэша, func вызывается с исходными
+        аргументами.
+    :param prefetch: Функция, которая по аргументам вызова и результату
+        возвращает аргументы следующего ожидаемого вызова (или None). Этот
+        вызов выполняется в фоне, чтобы результат уже был в кэше (см.
+        cache.prefetch).
     :return: None или объект класса model.
     """
     def wrapper(func):
+        nonlocal expire
+
+        function_name = func.__qualname__.replace('.<locals>', '')
+        metrics = CacheMetrics(namespace, function_name)
+
+        policy = None if soft_expire else settings.cache_ttl.policy(function_name, namespace)
+        if policy is not None:
+            expire = policy.expire
+        adaptive = policy is not None and policy.adaptive
+        use_shared = settings.shared_cache.enabled if shared_cache is None else shared_cache
+
         @wraps(func)
         async def inner(*args, **kwargs):
             nonlocal model
@@ -38,42 +133,317 @@ def pydantic_cache(
             key_builder = key_builder or FastAPICache.get_key_builder()
             backend = FastAPICache.get_backend()
 
-            if inspect.iscoroutinefunction(key_builder):
-                cache_key = await key_builder(
-                    func,
-                    namespace,
-                    args=args,
-                    kwargs=kwargs,
-                )
-            else:
-                cache_key = key_builder(
-                    func,
-                    namespace,
-                    args=args,
-                    kwargs=kwargs,
-                )
+            # Упреждающие вызовы и прогрев не отражают обращений пользователей
+            background = prefetching.get() or warming.get()
+            record_hot = settings.hot_keys.enabled and not background
+
+            key_args, key_kwargs = args, kwargs
+            if normalize is not None:
+                bound = bind_arguments(func, args, kwargs)
+                if record_hot:
+                    hot_calls.record(func, bound.arguments)
+                key_args, key_kwargs = normalized(bound)
+
+            cache_key = await _build_key(key_builder, func, namespace, key_args, key_kwargs)
+            if record_hot:
+                hot_calls.add('keys', cache_key)
+
+            track_key(cache_key)
+
+            fresh_expire, store_expire = expires()
+
+            l1, l1_expire, shm, shm_expire = tiers(fresh_expire)
+
+            if l1 is not None:
+                local_value = l1.get(cache_key)
+                if local_value is not local.MISSING:
+                    local.stats.local_hits += 1
+                    metrics.l1_hits.inc()
+                    return local_value
+
+            def decode(value, from_shared=False):
+                with metrics.decode_seconds.time():
+                    decode_value = coder.decode(value)
+                    if decode_value is not None:
+                        decode_value = model.parse_obj(decode_value)
+                if l1 is not None:
+                    l1.set(cache_key, decode_value, len(value), l1_expire)
+                if shm is not None and not from_shared:
+                    shm.set(cache_key, value, shm_expire)
+                return decode_value
+
+            if shm is not None:
+                shared_value = shm.get(cache_key)
+                if shared_value is not local.MISSING:
+                    metrics.shm_hits.inc()
+                    return decode(shared_value, from_shared=True)
 
+            if not cache_health.available():
+                # Redis медленный или недоступен: идем сразу в БД
+                metrics.bypassed.inc()
+                return await single_flight.do(cache_key, lambda: func(*args, **kwargs))
+
+            ttl = None
             try:
-                cache_value = await backend.get(cache_key)
-            except ConnectionError:
+                with metrics.get_seconds.time():
+                    if soft_expire:
+                        ttl, cache_value = await cache_health.call(
+                            backend.get_with_ttl(cache_key), settings.cache_health.get_timeout
+                        )
+                    elif adaptive and not warming.get() and hasattr(backend, 'get_extend'):
+                        cache_value = await cache_health.call(
+                            backend.get_extend(cache_key, expire, max_expire()),
+                            settings.cache_health.get_timeout,
+                        )
+                    else:
+                        cache_value = await cache_health.call(
+                            backend.get(cache_key), settings.cache_health.get_timeout
+                        )
+            except BACKEND_ERRORS as e:
+                metrics.get_errors.inc()
+                logger.warning('Cache get %s failed: %r', cache_key, e)
                 cache_value = None
 
+            async def compute():
+                fresh_value = await func(*args, **kwargs)
+                entry = PendingWrite(
+                    cache_key, fresh_value, coder, store_expire, metrics, l1, l1_expire, shm, shm_expire,
+                    deadline_expire(),
+                )
+                if settings.cache_write_behind.enabled:
+                    await write_behind.write(entry)
+                else:
+                    await write_entries([entry])
+                return fresh_value
+
+            async def compute_locked():
+                redis_lock = RedisLock(
+                    backend.redis, cache_key, settings.cache_lock.expire
+                )
+                get_timeout = settings.cache_health.get_timeout
+                try:
+                    if not await cache_health.call(redis_lock.acquire(), get_timeout):
+                        # Ключ уже пересчитывает другой воркер, ждем
+                        deadline = time.monotonic() + settings.cache_lock.wait
+                        while time.monotonic() < deadline:
+                            await asyncio.sleep(settings.cache_lock.poll_interval)
+                            cache_value = await cache_health.call(backend.get(cache_key), get_timeout)
+                            if cache_value is not None:
+                                return decode(cache_value)
+                except BACKEND_ERRORS:
+                    metrics.lock_errors.inc()
+
+                try:
+                    return await compute()
+                finally:
+                    try:
+                        await cache_health.call(redis_lock.release(), get_timeout)
+                    except BACKEND_ERRORS:
+                        metrics.lock_errors.inc()
+
+            use_lock = settings.cache_lock.enabled if lock is None else lock
+            recompute = compute_locked if use_lock else compute
+
             if cache_value is not None:
-                decode_value = coder.decode(cache_value)
-                if decode_value is not None:
-                    return model.parse_obj(decode_value)
-                return decode_value
+                local.stats.remote_hits += 1
+                metrics.l2_hits.inc()
+                if ttl is not None and 0 <= ttl < store_expire - fresh_expire:
+                    # Запись устарела: отдаем как есть и обновляем в фоне
+                    metrics.stale_hits.inc()
+                    single_flight.run(cache_key, recompute)
+                return decode(cache_value)
 
-            fresh_value = await func(*args, **kwargs)
+            local.stats.misses += 1
+            metrics.misses.inc()
             try:
-                await backend.set(
-                    cache_key, coder.encode(fresh_value), expire or FastAPICache.get_expire()
-                )
-            except ConnectionError:
-                pass
+                return await single_flight.do(cache_key, recompute)
+            except DBManagerError:
+                if not settings.stale_if_error.enabled:
+                    raise
+                try:
+                    stale_value = await cache_health.call(
+                        get_stale(backend, cache_key), settings.cache_health.get_timeout
+                    )
+                except BACKEND_ERRORS:
+                    stale_value = None
+                if stale_value is None:
+                    raise
+                # БД недоступна: отдаем теневую копию, минуя L1
+                metrics.stale_if_error.inc()
+                mark_stale()
+                with metrics.decode_seconds.time():
+                    stale_value = coder.decode(stale_value)
+                return model.parse_obj(stale_value) if stale_value is not None else None
+
+        def normalized(bound: inspect.BoundArguments) -> tuple[tuple, dict]:
+            """Аргументы для ключа кэша: нормализуется копия, вызов func
+            получает исходные аргументы.
+
+            """
+            arguments = dict(bound.arguments)
+            normalize(arguments)
+            key_bound = inspect.BoundArguments(bound.signature, arguments)
+            return key_bound.args, key_bound.kwargs
+
+        def expires() -> tuple[int, int]:
+            """Время, в течение которого запись свежая, и время ее жизни в
+            Redis.
+
+            """
+            if soft_expire:
+                return soft_expire, max(hard_expire or settings.cache_swr.hard_expire, soft_expire)
+            return expire, expire
+
+        def tiers(fresh_expire: int) -> tuple[Optional[local.LocalCache], int, Optional[shared.SharedCache], int]:
+            """Уровни кэша перед Redis и время жизни записей в них."""
+            l1 = local.local_cache if local_cache else None
+            l1_expire = min(local_expire or settings.local_cache.expire, fresh_expire)
+            shm = shared.shared_cache if use_shared else None
+            shm_expire = min(settings.shared_cache.expire, fresh_expire)
+            return l1, l1_expire, shm, shm_expire
+
+        def max_expire() -> int:
+            if settings.cache_tags.enabled:
+                return min(policy.max_expire, settings.cache_tags.expire)
+            return policy.max_expire
+
+        def deadline_expire() -> int:
+            """Предельное время жизни новой записи, 0 - запись не продлевается."""
+            if adaptive and hasattr(FastAPICache.get_backend(), 'get_extend'):
+                return max_expire()
+            return 0
+
+        async def get_many(
+                calls: list[dict[str, Any]],
+                fetch: Callable[[list[dict[str, Any]]], Awaitable[list]],
+        ) -> list:
+            """
+            Пакетный вариант func: значения для нескольких наборов аргументов
+            за одно обращение к Redis (MGET). Промахи передаются в fetch одним
+            списком, найденные значения записываются в Redis одним pipeline.
+            Ключи те же, что и у одиночных вызовов. Фоновое обновление
+            (stale-while-revalidate) и блокировки здесь не используются.
+
+            :param calls: Именованные аргументы вызовов func.
+            :param fetch: Корутина, которая получает аргументы промахов и
+                возвращает значения в том же порядке.
+            :return: Значения в порядке calls.
+            """
+            nonlocal coder
+            nonlocal expire
+            nonlocal key_builder
+
+            coder = coder or FastAPICache.get_coder()
+            expire = expire or FastAPICache.get_expire()
+            key_builder = key_builder or FastAPICache.get_key_builder()
+            backend = FastAPICache.get_backend()
+
+            fresh_expire, store_expire = expires()
+            l1, l1_expire, shm, shm_expire = tiers(fresh_expire)
+
+            # Одинаковые вызовы запрашиваем один раз
+            keys, params = [], {}
+            for call in calls:
+                if normalize is not None:
+                    bound = bind_arguments(func, (), call)
+                    (args, kwargs), arguments = normalized(bound), dict(bound.arguments)
+                else:
+                    args, kwargs, arguments = (), call, call
+                cache_key = await _build_key(key_builder, func, namespace, args, kwargs)
+                track_key(cache_key)
+                keys.append(cache_key)
+                params.setdefault(cache_key, arguments)
+
+            def decode(cache_key, value):
+                with metrics.decode_seconds.time():
+                    decode_value = coder.decode(value)
+                    if decode_value is not None:
+                        decode_value = model.parse_obj(decode_value)
+                if l1 is not None:
+                    l1.set(cache_key, decode_value, len(value), l1_expire)
+                return decode_value
+
+            values = {}
+            remote = []
+            for cache_key in params:
+                local_value = l1.get(cache_key) if l1 is not None else local.MISSING
+                if local_value is not local.MISSING:
+                    local.stats.local_hits += 1
+                    metrics.l1_hits.inc()
+                    values[cache_key] = local_value
+                    continue
+                shared_value = shm.get(cache_key) if shm is not None else local.MISSING
+                if shared_value is not local.MISSING:
+                    metrics.shm_hits.inc()
+                    values[cache_key] = decode(cache_key, shared_value)
+                    continue
+                remote.append(cache_key)
+
+            cache_values = [None] * len(remote)
+            if remote and not cache_health.available():
+                metrics.bypassed.inc(len(remote))
+            elif remote:
+                if hasattr(backend, 'get_many'):
+                    get_remote = backend.get_many(remote)
+                else:
+                    get_remote = asyncio.gather(*map(backend.get, remote))
+                try:
+                    with metrics.get_seconds.time():
+                        cache_values = await cache_health.call(
+                            get_remote, settings.cache_health.get_timeout
+                        )
+                except BACKEND_ERRORS as e:
+                    metrics.get_errors.inc()
+                    logger.warning('Cache get_many failed: %r', e)
+
+            missing = []
+            for cache_key, cache_value in zip(remote, cache_values):
+                if cache_value is None:
+                    local.stats.misses += 1
+                    metrics.misses.inc()
+                    missing.append(cache_key)
+                    continue
+                local.stats.remote_hits += 1
+                metrics.l2_hits.inc()
+                values[cache_key] = decode(cache_key, cache_value)
+                if shm is not None:
+                    shm.set(cache_key, cache_value, shm_expire)
+
+            if missing:
+                fresh_values = await fetch([
+                    {name: value for name, value in params[cache_key].items() if name not in SKIP_PARAMS}
+                    for cache_key in missing
+                ])
+                entries = []
+                for cache_key, fresh_value in zip(missing, fresh_values):
+                    values[cache_key] = fresh_value
+                    entries.append(PendingWrite(
+                        cache_key, fresh_value, coder, store_expire, metrics, l1, l1_expire, shm, shm_expire,
+                        deadline_expire(),
+                    ))
+
+                if settings.cache_write_behind.enabled:
+                    for entry in entries:
+                        await write_behind.write(entry)
+                else:
+                    await write_entries(entries)
+
+            return [values[cache_key] for cache_key in keys]
+
+        if prefetch is not None:
+            cached = inner
 
-            return fresh_value
+            @wraps(func)
+            async def inner(*args, **kwargs):
+                value = await cached(*args, **kwargs)
+                if value is not None and prefetcher.allow():
+                    bound = bind_arguments(func, args, kwargs)
+                    next_params = prefetch(dict(bound.arguments), value)
+                    if next_params is not None:
+                        prefetcher.schedule(lambda: cached(**next_params))
+                return value
 
+        inner.get_many = get_many
         return inner
 
     return wrapper
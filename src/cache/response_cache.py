@@ -0,0 +1,155 @@
+"""Кэширование готовых HTTP ответов. Даже при попадании в pydantic_cache
+ответ собирается заново: модели из кэша, модели ответа в роутере, валидация
+по response_model и сериализация. Здесь же храним в Redis итоговое тело и
+заголовки ответа, и попадание стоит чуть больше одного GET в Redis.
+
+Подключается к роутеру через route_class:
+
+    router = APIRouter(route_class=CachedRoute)
+
+"""
+from typing import Callable
+from urllib.parse import urlencode
+
+import orjson
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+from cache.backend import BACKEND_ERRORS
+from cache.health import cache_health
+from cache.hot_calls import hot_calls
+from cache.prefetch import prefetcher
+from cache.stale import is_stale
+from cache.tags import request_keys, set_with_dependencies
+from core.config import settings
+from db import redis
+
+# Заголовки, которые Response вычисляет сам
+SKIP_HEADERS = {b'content-length'}
+
+# Параметры пути, по которым считаем самые запрашиваемые сущности
+HOT_PATH_PARAMS = {'film_id': 'films', 'person_id': 'persons', 'genre_id': 'genres'}
+
+
+def response_key(request: Request) -> str:
+    """
+    Ключ кэша ответа: нормализованный путь, отсортированные параметры запроса
+    и роли пользователя (request.state.auth).
+
+    :param request: Запрос.
+    :return: Ключ для Redis.
+    """
+    roles = ','.join(sorted(set(getattr(request.state, 'auth', None) or [])))
+    return f"response:{request_path(request)}:{roles}"
+
+
+def request_path(request: Request) -> str:
+    """Нормализованный путь с отсортированными по имени параметрами запроса.
+    Порядок повторяющихся параметров (пр. ids) сохраняется - от него зависит
+    порядок в ответе.
+
+    """
+    path = request.url.path.rstrip('/') or '/'
+    query = urlencode(sorted(request.query_params.multi_items(), key=lambda item: item[0]))
+    return f"{path}?{query}"
+
+
+def encode_response(response: Response) -> bytes:
+    """Заголовки в JSON и тело ответа через перевод строки."""
+    headers = [
+        (name.decode('latin-1'), value.decode('latin-1'))
+        for name, value in response.raw_headers
+        if name not in SKIP_HEADERS
+    ]
+    return orjson.dumps({'s': response.status_code, 'h': headers}) + b'\n' + response.body
+
+
+def decode_response(value: bytes) -> Response:
+    """Ответ из encode_response. Заголовки восстанавливаются списком, без
+    словаря: повторяющиеся заголовки (пр. Vary, Set-Cookie) сохраняются.
+
+    """
+    meta, _, body = value.partition(b'\n')
+    meta = orjson.loads(meta)
+    response = Response(content=body, status_code=meta['s'])
+    response.raw_headers.extend(
+        (name.encode('latin-1'), value.encode('latin-1')) for name, value in meta['h']
+    )
+    return response
+
+
+def record_hot(request: Request):
+    """Учет запроса, запрошенных сущностей и поисковой строки в
+    cache.hot_calls. Выполняется и для ответов из кэша.
+
+    """
+    hot_calls.add('requests', request_path(request))
+    for name, category in HOT_PATH_PARAMS.items():
+        value = request.path_params.get(name)
+        if value is not None:
+            hot_calls.add(category, str(value))
+    search = request.query_params.get('query')
+    if search:
+        hot_calls.add('searches', ' '.join(search.lower().split()))
+
+
+class CachedRoute(APIRoute):
+    """APIRoute, который отдает GET ответы из Redis, минуя обработчик."""
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def handle(request: Request) -> Response:
+            if settings.hot_keys.enabled:
+                record_hot(request)
+
+            if (
+                not settings.response_cache.enabled
+                or request.method != 'GET'
+                or not cache_health.available()
+            ):
+                return await route_handler(request)
+
+            key = response_key(request)
+            try:
+                cached = await cache_health.call(
+                    redis.redis.get(key), settings.cache_health.get_timeout
+                )
+            except BACKEND_ERRORS:
+                cached = None
+
+            if cached is not None:
+                return decode_response(cached)
+
+            # Запоминаем ключи pydantic_cache, из которых собран ответ, чтобы
+            # удалить его при инвалидации любого из них
+            keys = set()
+            token = request_keys.set(keys)
+            try:
+                response = await route_handler(request)
+            finally:
+                request_keys.reset(token)
+
+            if response.status_code == 200 and not cache_health.bypassed and not is_stale():
+                try:
+                    await cache_health.call(
+                        set_with_dependencies(
+                            redis.redis, key, encode_response(response), settings.response_cache.expire, keys
+                        ),
+                        settings.cache_health.set_timeout,
+                        timed=False,
+                    )
+                except BACKEND_ERRORS:
+                    pass
+
+            return response
+
+        async def cached_route_handler(request: Request) -> Response:
+            prefetcher.active_requests += 1
+            try:
+                return await handle(request)
+            finally:
+                prefetcher.active_requests -= 1
+
+        return cached_route_handler
@@ -0,0 +1,249 @@
+"""Общий для воркеров gunicorn уровень кэша в разделяемой памяти. Сидит
+между L1 (память воркера) и Redis: значение, полученное одним воркером,
+остальные воркеры на этом хосте читают без похода в сеть.
+
+Хранилище - файл фиксированного размера в /dev/shm, отображенный в память
+(mmap) каждым воркером. Внутри - множественно-ассоциативная хеш таблица:
+ключ (blake2b от ключа кэша) определяет набор из ways слотов фиксированного
+размера slot_size. Значения больше слота сюда не попадают. Вытеснение
+внутри набора - по TTL, затем алгоритмом часов (clock, приближение LRU):
+при чтении слот помечается, стрелка набора снимает пометки и вытесняет
+первый непомеченный слот.
+
+Между процессами наборы защищаются блокировками fcntl.lockf на байт стрелки
+набора. Внутри воркера операции синхронные (без await), поэтому отдельная
+блокировка не нужна.
+
+Хранятся закодированные значения (как в Redis), при попадании значение
+декодируется и кладется в L1.
+
+Все воркеры должны открывать файл с одинаковыми параметрами: при их
+расхождении файл создается заново под временным именем и подменяет старый
+(размер уже отображенного файла не меняется).
+
+"""
+import fcntl
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from hashlib import blake2b
+from typing import Iterator, Optional, Union
+
+from cache.local import MISSING
+
+MAGIC = b'MVSHM001'
+# magic, количество наборов, слотов в наборе, размер слота
+HEADER = struct.Struct('<8sIII')
+# digest ключа, время истечения (time.time()), длина значения, пометка clock
+SLOT = struct.Struct('<16sdIB3x')
+REF_OFFSET = 16 + 8 + 4
+EMPTY_DIGEST = bytes(16)
+
+
+def _align(size: int) -> int:
+    return (size + mmap.PAGESIZE - 1) // mmap.PAGESIZE * mmap.PAGESIZE
+
+
+class SharedCache:
+    def __init__(self, path: str, size: int = 32 * 1024 * 1024, slot_size: int = 8192, ways: int = 8):
+        """
+        :param path: Путь к файлу, пр. /dev/shm/movies-cache.
+        :param size: Примерный объем таблицы в байтах.
+        :param slot_size: Размер слота, ограничивает размер значения.
+        :param ways: Количество слотов в наборе (не больше 255).
+        """
+        if not 0 < ways < 256 or slot_size <= SLOT.size:
+            raise ValueError('Invalid shared cache layout')
+
+        self.path = path
+        self.slot_size = slot_size
+        self.ways = ways
+        self.capacity = slot_size - SLOT.size
+        self.sets = max(1, size // (slot_size * ways))
+        # Заголовок, затем стрелки наборов по байту, затем слоты
+        self.hands_offset = HEADER.size
+        self.slots_offset = _align(HEADER.size + self.sets)
+        self.total_size = self.slots_offset + self.sets * ways * slot_size
+
+        self.fd = self._open()
+        try:
+            self.mm = mmap.mmap(self.fd, self.total_size)
+        except Exception:
+            os.close(self.fd)
+            raise
+
+    def _open(self) -> int:
+        """Открытие файла с нужной разметкой. Файл, который уже могут
+        отображать другие воркеры, нельзя обрезать или менять его размер
+        (обращение к отображению за концом файла - SIGBUS). Поэтому при
+        другой разметке новый файл собирается рядом и подменяет старый
+        (os.replace): воркеры со старым отображением продолжают работать со
+        старым файлом до перезапуска.
+
+        """
+        header = HEADER.pack(MAGIC, self.sets, self.ways, self.slot_size)
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                result = self._check(fd, header)
+            except Exception:
+                os.close(fd)
+                raise
+            if result != fd:
+                # Файл подменен (нами или другим воркером), старый не нужен
+                os.close(fd)
+            if result is not None:
+                return result
+
+    def _check(self, fd: int, header: bytes) -> Optional[int]:
+        """Проверка и при необходимости подготовка открытого файла под
+        блокировкой заголовка.
+
+        :return: Дескриптор файла с нужной разметкой или None, если файл
+            подменил другой воркер и его нужно открыть заново.
+        """
+        fcntl.lockf(fd, fcntl.LOCK_EX, HEADER.size, 0)
+        try:
+            # Пока ждали блокировку, файл мог подменить другой воркер
+            if os.fstat(fd).st_ino != os.stat(self.path).st_ino:
+                return None
+            size = os.fstat(fd).st_size
+            if size == self.total_size and os.pread(fd, HEADER.size, 0) == header:
+                return fd
+            if size == 0:
+                # Только что созданный файл еще никто не отображает
+                os.ftruncate(fd, self.total_size)
+                os.pwrite(fd, header, 0)
+                return fd
+            return self._replace(header)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, HEADER.size, 0)
+
+    def _replace(self, header: bytes) -> int:
+        """Новый файл с разметкой header вместо файла по пути self.path."""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self.total_size)
+            os.pwrite(fd, header, 0)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.close(fd)
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return fd
+
+    def close(self):
+        self.mm.close()
+        os.close(self.fd)
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return blake2b(key.encode(), digest_size=16).digest()
+
+    def _set_index(self, digest: bytes) -> int:
+        return int.from_bytes(digest[:8], 'little') % self.sets
+
+    def _slot(self, set_index: int, way: int) -> int:
+        return self.slots_offset + (set_index * self.ways + way) * self.slot_size
+
+    @contextmanager
+    def _locked(self, set_index: int) -> Iterator[None]:
+        offset = self.hands_offset + set_index
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, offset)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, offset)
+
+    def _find(self, set_index: int, digest: bytes) -> Optional[int]:
+        for way in range(self.ways):
+            offset = self._slot(set_index, way)
+            if self.mm[offset:offset + 16] == digest:
+                return offset
+        return None
+
+    def get(self, key: str) -> Union[bytes, object]:
+        """
+        :param key: Ключ кэша.
+        :return: Закодированное значение или MISSING.
+        """
+        digest = self._digest(key)
+        set_index = self._set_index(digest)
+        with self._locked(set_index):
+            offset = self._find(set_index, digest)
+            if offset is None:
+                return MISSING
+            _, expire_at, length, ref = SLOT.unpack_from(self.mm, offset)
+            if expire_at <= time.time():
+                SLOT.pack_into(self.mm, offset, EMPTY_DIGEST, 0, 0, 0)
+                return MISSING
+            if not ref:
+                self.mm[offset + REF_OFFSET] = 1
+            start = offset + SLOT.size
+            return self.mm[start:start + length]
+
+    def set(self, key: str, value: bytes, expire: int) -> bool:
+        """
+        :param key: Ключ кэша.
+        :param value: Закодированное значение.
+        :param expire: Время жизни записи в секундах.
+        :return: False, если значение не помещается в слот.
+        """
+        if len(value) > self.capacity or expire <= 0:
+            return False
+
+        digest = self._digest(key)
+        set_index = self._set_index(digest)
+        now = time.time()
+        with self._locked(set_index):
+            offset = self._find(set_index, digest)
+            if offset is None:
+                offset = self._free_slot(set_index, now)
+            if offset is None:
+                offset = self._evict(set_index)
+            SLOT.pack_into(self.mm, offset, digest, now + expire, len(value), 1)
+            start = offset + SLOT.size
+            self.mm[start:start + len(value)] = value
+        return True
+
+    def delete(self, key: str):
+        digest = self._digest(key)
+        set_index = self._set_index(digest)
+        with self._locked(set_index):
+            offset = self._find(set_index, digest)
+            if offset is not None:
+                SLOT.pack_into(self.mm, offset, EMPTY_DIGEST, 0, 0, 0)
+
+    def _free_slot(self, set_index: int, now: float) -> Optional[int]:
+        """Пустой слот или слот с истекшим TTL."""
+        for way in range(self.ways):
+            offset = self._slot(set_index, way)
+            _, expire_at, _, _ = SLOT.unpack_from(self.mm, offset)
+            if expire_at <= now:
+                return offset
+        return None
+
+    def _evict(self, set_index: int) -> int:
+        """Алгоритм часов: снимаем пометки, пока не найдем непомеченный
+        слот. Не больше двух оборотов стрелки.
+
+        """
+        hand_offset = self.hands_offset + set_index
+        hand = self.mm[hand_offset] % self.ways
+        while True:
+            offset = self._slot(set_index, hand)
+            hand = (hand + 1) % self.ways
+            if self.mm[offset + REF_OFFSET]:
+                self.mm[offset + REF_OFFSET] = 0
+            else:
+                self.mm[hand_offset] = hand
+                return offset
+
+
+shared_cache: Optional[SharedCache] = None
@@ -0,0 +1,99 @@
+"""Объединение одновременных промахов кэша (single-flight).
+
+Когда популярный ключ истекает, все параллельные запросы получают промах и
+каждый из них идет в Elastic с одним и тем же запросом. Внутри воркера
+достаточно запомнить задачу, которая уже вычисляет значение, и дождаться ее
+результата. Между воркерами договариваемся через короткую блокировку в Redis:
+ключ пересчитывает только владелец блокировки, остальные ждут появления
+свежего значения в кэше.
+
+"""
+import asyncio
+import uuid
+from typing import Any, Awaitable, Callable
+
+from redis.asyncio.client import Redis
+
+# Удаляем блокировку только если она все еще наша
+UNLOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет func один раз для всех одновременных вызовов с одинаковым
+        ключом. Вычисление запускается отдельной задачей, поэтому отмена
+        запроса, начавшего вычисление, не затрагивает остальных ожидающих.
+
+        :param key: Ключ кэша.
+        :param func: Корутинная функция без аргументов.
+        :return: Результат func.
+        """
+        return await asyncio.shield(self.run(key, func))
+
+    def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        Запускает func в фоне, если для ключа еще нет активного вычисления.
+
+        :param key: Ключ кэша.
+        :param func: Корутинная функция без аргументов.
+        :return: Задача, вычисляющая значение.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Забираем исключение, чтобы asyncio не ругался, если все ожидающие
+        # успели отмениться
+        if not task.cancelled():
+            task.exception()
+
+
+class RedisLock:
+    """Короткая блокировка в Redis (SET NX PX) для пересчета ключа одним
+    воркером.
+
+    """
+
+    def __init__(self, redis: Redis, key: str, expire: float):
+        """
+        :param redis: Подключение к Redis.
+        :param key: Ключ кэша, для которого берется блокировка.
+        :param expire: Время жизни блокировки в секундах.
+        """
+        self.redis = redis
+        self.key = f"lock:{key}"
+        self.expire = int(expire * 1000)
+        self.token = uuid.uuid4().hex
+        self.acquired = False
+
+    async def acquire(self) -> bool:
+        self.acquired = bool(
+            await self.redis.set(self.key, self.token, nx=True, px=self.expire)
+        )
+        return self.acquired
+
+    async def release(self):
+        if self.acquired:
+            await self.redis.eval(UNLOCK_SCRIPT, 1, self.key, self.token)
+            self.acquired = False
+
+
+single_flight = SingleFlight()
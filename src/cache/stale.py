@@ -0,0 +1,67 @@
+"""Режим stale-if-error. Рядом с каждой записью pydantic_cache хранится ее
+теневая копия <ключ>:stale, которая живет settings.stale_if_error.expire
+(дольше самой записи). Если при промахе БД отвечает ошибкой
+(DBManagerError), вместо ошибки отдаем теневую копию, а ответ помечаем
+заголовком STALE_HEADER. Так сбои и перезапуски Elastic не превращаются в
+ошибки для пользователей.
+
+Признак устаревшего ответа передается из pydantic_cache в middleware через
+изменяемый объект в contextvar: middleware создает его до обработки запроса,
+pydantic_cache (в том числе внутри задач, созданных при обработке)
+отмечает его.
+
+Теневые копии не удаляются при инвалидации по тегам: при недоступной БД
+устаревшие данные лучше ошибки.
+
+"""
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi_cache.backends import Backend
+
+from core.config import settings
+
+STALE_SUFFIX = ':stale'
+STALE_HEADER = 'X-Cache-Status'
+STALE_VALUE = 'stale'
+
+
+class StaleMark:
+    __slots__ = ('stale',)
+
+    def __init__(self):
+        self.stale = False
+
+
+stale_mark: ContextVar[Optional[StaleMark]] = ContextVar('stale_mark', default=None)
+
+
+def stale_key(key: str) -> str:
+    return f"{key}{STALE_SUFFIX}"
+
+
+def begin() -> StaleMark:
+    """Начало обработки запроса (вызывается в middleware)."""
+    mark = StaleMark()
+    stale_mark.set(mark)
+    return mark
+
+
+def mark_stale():
+    mark = stale_mark.get()
+    if mark is not None:
+        mark.stale = True
+
+
+def is_stale() -> bool:
+    mark = stale_mark.get()
+    return mark is not None and mark.stale
+
+
+def stale_expire(expire: int) -> int:
+    """Время жизни теневой копии, не меньше времени жизни самой записи."""
+    return max(settings.stale_if_error.expire, expire)
+
+
+async def get_stale(backend: Backend, key: str) -> Optional[bytes]:
+    return await backend.get(stale_key(key))
@@ -0,0 +1,204 @@
+"""Инвалидация кэша по id сущностей.
+
+При записи в кэш запоминаем, id каких фильмов, персон и жанров содержит
+значение: для каждого тега (пр. 'film:<id>') в Redis хранится множество
+ключей tag:<тег>. Ответы, закэшированные CachedRoute, привязываются к
+использованным при их сборке ключам через множества dep:<ключ>.
+
+ETL публикует измененные id в Redis stream (settings.cache_tags.stream)
+напрямую или через admin ручку. Каждый воркер читает stream, удаляет
+затронутые ключи из Redis, своего локального кэша (L1) и разделяемой памяти.
+Изменение любой сущности снимает и тег количества результатов ее типа
+(пр. 'film:<id>' - 'count:film'): новые и измененные объекты меняют
+количество в выдаче, которое кэшируется отдельно от страниц.
+
+Множества тегов не удаляются, а живут settings.cache_tags.expire: так все
+воркеры успевают прочитать их содержимое, а повторное удаление ключей
+безопасно.
+
+"""
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import Any, Iterable, Optional
+
+from pydantic import BaseModel
+from redis.asyncio.client import Redis
+from redis.exceptions import RedisError
+
+from cache import local, shared
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Тег количества результатов поиска (models.node.Total)
+COUNT_TAG = 'count'
+
+# Ключи кэша, использованные при обработке текущего запроса
+request_keys: ContextVar[Optional[set[str]]] = ContextVar('request_keys', default=None)
+
+
+def track_key(key: str):
+    keys = request_keys.get()
+    if keys is not None:
+        keys.add(key)
+
+
+def _model_tags(obj: BaseModel, tags: set[str], nested: bool):
+    if obj.cache_tag is not None and getattr(obj, 'id', None) is not None:
+        tags.add(f"{obj.cache_tag}:{obj.id}")
+        if not nested:
+            return
+    for name in obj.__fields__:
+        value = getattr(obj, name)
+        if isinstance(value, BaseModel):
+            _model_tags(value, tags, nested)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, BaseModel):
+                    _model_tags(item, tags, nested)
+
+
+def collect_tags(value: Any) -> set[str]:
+    """
+    Теги сущностей, которые содержит значение. Для одиночного объекта (пр.
+    фильм) учитываются и вложенные объекты (жанры, персоны). Для списков -
+    только id самих элементов: списковые ручки не показывают вложенные данные.
+
+    :param value: Pydantic объект или None.
+    :return: Множество тегов вида 'film:<id>'.
+    """
+    tags = set()
+    if isinstance(value, BaseModel):
+        _model_tags(value, tags, nested=value.cache_tag is not None)
+    return tags
+
+
+def with_count_tags(tags: Iterable[str]) -> set[str]:
+    """Теги вместе с тегами количества результатов их типов сущностей."""
+    tags = set(tags)
+    for tag in list(tags):
+        kind = tag.split(':', 1)[0]
+        if kind != COUNT_TAG and kind != tag:
+            tags.add(f"{COUNT_TAG}:{kind}")
+    return tags
+
+
+def entity_tags(films: Iterable = (), persons: Iterable = (), genres: Iterable = ()) -> list[str]:
+    return (
+        [f"film:{x}" for x in films]
+        + [f"person:{x}" for x in persons]
+        + [f"genre:{x}" for x in genres]
+    )
+
+
+async def set_many_with_tags(redis: Redis, items: Iterable[tuple[str, bytes, int, Iterable[str]]]):
+    """Запись значений и их тегов одним pipeline.
+
+    :param items: Четверки (ключ, значение, время жизни, теги).
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        for key, value, expire, tags in items:
+            pipe.set(key, value, ex=expire)
+            for tag in tags:
+                pipe.sadd(f"tag:{tag}", key)
+                pipe.expire(f"tag:{tag}", settings.cache_tags.expire)
+        await pipe.execute()
+
+
+async def set_with_dependencies(redis: Redis, key: str, value: bytes, expire: int, dependencies: Iterable[str]):
+    """Запись ответа, который нужно удалить вместе с любым из ключей
+    dependencies.
+
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set(key, value, ex=expire)
+        for dependency in dependencies:
+            pipe.sadd(f"dep:{dependency}", key)
+            pipe.expire(f"dep:{dependency}", settings.cache_tags.expire)
+        await pipe.execute()
+
+
+async def invalidate(redis: Redis, tags: Iterable[str]) -> int:
+    """
+    Удаление из кэша всех записей с указанными тегами и зависящих от них
+    ответов, а также закэшированных количеств результатов для тех же типов
+    сущностей.
+
+    :param redis: Подключение к Redis.
+    :param tags: Теги вида 'film:<id>'.
+    :return: Количество удаленных ключей в Redis.
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        for tag in with_count_tags(tags):
+            pipe.smembers(f"tag:{tag}")
+        keys = set().union(*await pipe.execute())
+    if not keys:
+        return 0
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.smembers(f"dep:{key.decode() if isinstance(key, bytes) else key}")
+        responses = set().union(*await pipe.execute())
+
+    for key in keys:
+        key = key.decode() if isinstance(key, bytes) else key
+        if local.local_cache is not None:
+            local.local_cache.delete(key)
+        if shared.shared_cache is not None:
+            shared.shared_cache.delete(key)
+
+    return await redis.delete(*keys, *responses)
+
+
+async def publish(redis: Redis, tags: list[str]) -> str:
+    """Отправка тегов на инвалидацию всем воркерам через Redis stream."""
+    message_id = await redis.xadd(
+        settings.cache_tags.stream,
+        {'tags': ','.join(tags)},
+        maxlen=settings.cache_tags.stream_maxlen,
+        approximate=True,
+    )
+    return message_id.decode() if isinstance(message_id, bytes) else message_id
+
+
+async def _last_id(redis: Redis) -> str:
+    """Id последнего сообщения stream, '0-0' - stream пуст."""
+    messages = await redis.xrevrange(settings.cache_tags.stream, count=1)
+    if not messages:
+        return '0-0'
+    message_id = messages[0][0]
+    return message_id.decode() if isinstance(message_id, bytes) else message_id
+
+
+async def consume(redis: Redis):
+    """Бесконечное чтение stream с тегами на инвалидацию. Запускается
+    отдельной задачей в каждом воркере, читаем только новые сообщения.
+
+    Вместо '$' читаем от id последнего сообщения: после ошибки чтение
+    продолжается с него же, и сообщения, опубликованные за время ошибки, не
+    теряются. Подключение redis не должно иметь socket_timeout меньше
+    cache_tags.block (см. db.redis.stream_redis).
+
+    """
+    last_id = None
+    while True:
+        try:
+            if last_id is None:
+                last_id = await _last_id(redis)
+            messages = await redis.xread(
+                {settings.cache_tags.stream: last_id}, block=settings.cache_tags.block
+            )
+            for _, entries in messages:
+                for message_id, fields in entries:
+                    tags = fields.get(b'tags') or fields.get('tags') or b''
+                    if isinstance(tags, bytes):
+                        tags = tags.decode()
+                    deleted = await invalidate(redis, filter(None, tags.split(',')))
+                    last_id = message_id
+                    logger.debug('Cache invalidation %s: %s keys deleted', last_id, deleted)
+        except asyncio.CancelledError:
+            raise
+        except (ConnectionError, RedisError) as e:
+            logger.warning('Cache invalidation consumer error: %s', e)
+            await asyncio.sleep(1)
@@ -0,0 +1,72 @@
+"""Потоковый подсчет самых частых элементов алгоритмом Space-Saving
+(Metwally et al.). Хранится не больше capacity счетчиков: новый элемент при
+заполнении вытесняет элемент с минимальным счетчиком и наследует его
+значение как погрешность. Элементы, встречающиеся чаще N / capacity раз,
+гарантированно остаются в таблице, а их счетчики завышены не больше чем на
+погрешность.
+
+Минимум ищется по куче с ленивым удалением устаревших записей, поэтому
+добавление стоит амортизированно O(log capacity).
+
+"""
+import heapq
+from itertools import count as counter
+from typing import Hashable
+
+
+class SpaceSaving:
+    def __init__(self, capacity: int = 1000):
+        """
+        :param capacity: Количество отслеживаемых элементов.
+        """
+        self.capacity = capacity
+        self.counts: dict[Hashable, int] = {}
+        self.errors: dict[Hashable, int] = {}
+        self._heap: list[tuple[int, int, Hashable]] = []
+        self._seq = counter()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, item: Hashable, count: int = 1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+            # Запись в куче обновим, только когда она окажется на вершине
+            return
+
+        error = 0
+        if len(counts) >= self.capacity:
+            error = self._pop_min()
+        counts[item] = error + count
+        self.errors[item] = error
+        heapq.heappush(self._heap, (counts[item], next(self._seq), item))
+
+    def _pop_min(self) -> int:
+        """Удаление элемента с минимальным счетчиком, возвращает счетчик."""
+        heap = self._heap
+        while True:
+            value, _, item = heap[0]
+            current = self.counts.get(item)
+            if current == value:
+                heapq.heappop(heap)
+                del self.counts[item]
+                del self.errors[item]
+                return value
+            if current is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (current, next(self._seq), item))
+
+    def top(self, limit: int) -> list[tuple[Hashable, int, int]]:
+        """
+        :param limit: Количество элементов.
+        :return: Тройки (элемент, счетчик, погрешность) по убыванию счетчика.
+        """
+        items = heapq.nlargest(limit, self.counts.items(), key=lambda item: item[1])
+        return [(item, value, self.errors[item]) for item, value in items]
+
+    def clear(self):
+        self.counts.clear()
+        self.errors.clear()
+        self._heap.clear()
@@ -0,0 +1,147 @@
+"""Прогрев кэша pydantic_cache. После деплоя или очистки Redis первые
+пользователи получают промахи на самых популярных ручках: список жанров,
+первые страницы фильмов по рейтингу, фильмы по жанрам.
+
+Прогреваются вызовы из settings.cache_warmup.calls и самые частые вызовы,
+замеченные воркерами (cache.hot_calls, при settings.hot_keys.enabled).
+Количество одновременных запросов ограничено settings.cache_warmup.concurrency,
+чтобы не перегружать Elastic. Вызовы прогрева не попадают в горячие и не
+продлевают записи с адаптивным TTL (cache.hot_calls.warming).
+
+Запуск при старте приложения и периодически - в startup() в main.py, вручную:
+
+    python -m cache.warmup
+
+"""
+import asyncio
+import logging
+from typing import Any
+
+from cache.hot_calls import top_calls, warming
+from core.config import WarmupCall, settings
+from db import elastic, redis
+from services.film import FilmService, get_film_service
+from services.genre import GenreService, get_genre_service
+from services.person import PersonService, get_person_service
+
+logger = logging.getLogger(__name__)
+
+SERVICES = {
+    'films': (FilmService, get_film_service),
+    'persons': (PersonService, get_person_service),
+    'genres': (GenreService, get_genre_service),
+}
+
+WARMUP_LOCK = 'lock:cache:warmup'
+
+
+def get_service(name: str):
+    return SERVICES[name][1](elastic=elastic.es)
+
+
+async def expand(call: WarmupCall) -> list[tuple[str, str, dict]]:
+    """Раскрытие вызова с per_genre в отдельный вызов для каждого жанра."""
+    if not call.per_genre:
+        return [(call.service, call.method, call.kwargs)]
+
+    genres = await get_service('genres').get_genres(size=100)
+    if not genres:
+        return []
+    return [
+        (call.service, call.method, {**call.kwargs, 'filter_genre': genre.id})
+        for genre in genres.results
+    ]
+
+
+async def hot(limit: int) -> list[tuple[str, str, dict]]:
+    services = {cls.__name__: name for name, (cls, _) in SERVICES.items()}
+    calls = []
+    for qualname, kwargs in await top_calls(redis.redis, limit):
+        cls_name, _, method = qualname.partition('.')
+        if cls_name in services:
+            calls.append((services[cls_name], method, kwargs))
+    return calls
+
+
+async def warm_up(with_hot: bool = True) -> int:
+    """
+    Однократный прогрев кэша.
+
+    :param with_hot: Прогревать и самые частые вызовы.
+    :return: Количество успешно выполненных вызовов.
+    """
+    token = warming.set(True)
+    try:
+        return await _warm_up(with_hot)
+    finally:
+        warming.reset(token)
+
+
+async def _warm_up(with_hot: bool) -> int:
+    calls = []
+    for call in settings.cache_warmup.calls:
+        calls.extend(await expand(call))
+    if with_hot:
+        calls.extend(await hot(settings.cache_warmup.hot_calls))
+
+    semaphore = asyncio.Semaphore(settings.cache_warmup.concurrency)
+
+    async def run(service: str, method: str, kwargs: dict[str, Any]) -> bool:
+        async with semaphore:
+            try:
+                await getattr(get_service(service), method)(**kwargs)
+                return True
+            except Exception as e:
+                logger.warning('Cache warm-up %s.%s(%s) failed: %s', service, method, kwargs, e)
+                return False
+
+    results = await asyncio.gather(*(run(*call) for call in calls))
+    logger.info('Cache warm-up: %s of %s calls', sum(results), len(calls))
+    return sum(results)
+
+
+async def acquire_lock() -> bool:
+    """Прогрев выполняет только один воркер за интервал."""
+    return bool(await redis.redis.set(
+        WARMUP_LOCK, 1, nx=True, ex=max(settings.cache_warmup.interval, 1)
+    ))
+
+
+async def run_periodic():
+    """Задача воркера: прогрев при старте, далее каждые
+    settings.cache_warmup.interval секунд прогрев самых частых вызовов.
+
+    """
+    if not settings.cache_warmup.enabled:
+        return
+
+    try:
+        if await acquire_lock():
+            await warm_up(with_hot=True)
+    except Exception as e:
+        logger.warning('Cache warm-up error: %s', e)
+
+    if settings.cache_warmup.interval <= 0:
+        return
+
+    while True:
+        await asyncio.sleep(settings.cache_warmup.interval)
+        try:
+            if await acquire_lock():
+                await warm_up(with_hot=True)
+        except Exception as e:
+            logger.warning('Cache warm-up error: %s', e)
+
+
+async def main():
+    from main import close_connections, init_connections
+
+    await init_connections()
+    try:
+        await warm_up(with_hot=True)
+    finally:
+        await close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
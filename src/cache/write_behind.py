@@ -0,0 +1,190 @@
+"""Отложенная запись в кэш (write-behind). При промахе pydantic_cache
+кодирует свежее значение и пишет его в Redis прямо в запросе, и клиент
+ждет лишний поход в Redis. В режиме write-behind значение кладется в
+ограниченную очередь воркера, а фоновая задача кодирует и записывает
+накопленные значения пачками через pipeline.
+
+Если очередь заполнена, поведение задает settings.cache_write_behind.overflow:
+'drop' - значение не кэшируется, 'inline' - записывается сразу, как без
+write-behind. Пока фоновая задача не запущена (пр. в CLI прогрева), запись
+всегда выполняется сразу.
+
+Задача запускается в startup(), при shutdown() очередь дописывается в Redis.
+
+"""
+import asyncio
+import logging
+import time
+from typing import Any, NamedTuple, Optional, Type
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.coder import Coder
+
+from cache.backend import BACKEND_ERRORS, deadline_key
+from cache.health import cache_health
+from cache.local import LocalCache
+from cache.shared import SharedCache
+from cache.metrics import CacheMetrics, cache_write_behind_dropped, cache_write_behind_queue
+from cache.stale import stale_expire, stale_key
+from cache.tags import collect_tags, set_many_with_tags
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PendingWrite(NamedTuple):
+    key: str
+    value: Any
+    coder: Type[Coder]
+    expire: int
+    metrics: CacheMetrics
+    l1: Optional[LocalCache] = None
+    l1_expire: int = 0
+    shared: Optional[SharedCache] = None
+    shared_expire: int = 0
+    # Предельное время жизни записи с адаптивным TTL, 0 - TTL не продлевается
+    max_expire: int = 0
+
+
+async def write_entries(entries: list[PendingWrite]):
+    """Кодирование значений и запись в Redis (с тегами) одним pipeline.
+    Значения попадают и в L1 и разделяемую память, если они указаны, а при
+    включенном stale-if-error пишутся и теневые копии (cache.stale). Для
+    записей с адаптивным TTL пишется их срок жизни (cache.backend). Пока
+    кэш обходится (см. cache.health), ничего не записывается.
+
+    """
+    if cache_health.bypassed:
+        return
+
+    backend = FastAPICache.get_backend()
+    items = []
+    for entry in entries:
+        encode_value = entry.coder.encode(entry.value)
+        entry.metrics.value_bytes.observe(len(encode_value))
+        tags = collect_tags(entry.value) if settings.cache_tags.enabled else ()
+        items.append((entry.key, encode_value, entry.expire, tags))
+        if entry.max_expire:
+            deadline = int(time.time()) + entry.max_expire
+            items.append((deadline_key(entry.key), str(deadline).encode(), entry.max_expire, ()))
+        if settings.stale_if_error.enabled:
+            items.append((stale_key(entry.key), encode_value, stale_expire(entry.expire), ()))
+        if entry.l1 is not None:
+            entry.l1.set(entry.key, entry.value, len(encode_value), entry.l1_expire)
+        if entry.shared is not None:
+            entry.shared.set(entry.key, encode_value, entry.shared_expire)
+
+    if any(tags for *_, tags in items):
+        set_items = set_many_with_tags(backend.redis, items)
+    elif hasattr(backend, 'set_many'):
+        set_items = backend.set_many(item[:3] for item in items)
+    else:
+        set_items = asyncio.gather(*(backend.set(*item[:3]) for item in items))
+
+    start = time.perf_counter()
+    try:
+        await cache_health.call(set_items, settings.cache_health.set_timeout, timed=False)
+    except BACKEND_ERRORS as e:
+        for metrics in {id(entry.metrics): entry.metrics for entry in entries}.values():
+            metrics.set_errors.inc()
+        logger.warning('Cache set of %s keys failed: %r', len(items), e)
+        return
+
+    elapsed = time.perf_counter() - start
+    for metrics in {id(entry.metrics): entry.metrics for entry in entries}.values():
+        metrics.set_seconds.observe(elapsed)
+
+
+class WriteBehind:
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        # Собираемая пачка и текущая запись, их дописываем при остановке
+        self.pending: list[PendingWrite] = []
+        self.flushing: Optional[asyncio.Future] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def submit(self, entry: PendingWrite) -> bool:
+        """
+        Постановка значения в очередь на запись.
+
+        :param entry: Значение с параметрами записи.
+        :return: False, если очередь заполнена или фоновая задача не запущена.
+        """
+        if not self.running:
+            return False
+        try:
+            # Значение кодируется позже, а вызывающий код может изменить
+            # объект, поэтому в очередь кладем копию
+            self.queue.put_nowait(entry._replace(value=LocalCache._copy(entry.value)))
+        except asyncio.QueueFull:
+            return False
+        cache_write_behind_queue.value = self.queue.qsize()
+        return True
+
+    async def write(self, entry: PendingWrite):
+        """Запись значения в режиме write-behind с учетом переполнения
+        очереди.
+
+        """
+        if self.submit(entry):
+            return
+        if self.running and settings.cache_write_behind.overflow == 'drop':
+            cache_write_behind_dropped.inc()
+            return
+        await write_entries([entry])
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=settings.cache_write_behind.max_size)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка фоновой задачи и запись оставшихся значений."""
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        if self.flushing is not None:
+            await self.flushing
+        if self.pending:
+            await self._flush(self.pending)
+            self.pending = []
+
+        while not self.queue.empty():
+            await self._flush(self._drain(settings.cache_write_behind.batch_size))
+
+    def _drain(self, limit: int) -> list[PendingWrite]:
+        entries = []
+        while len(entries) < limit and not self.queue.empty():
+            entries.append(self.queue.get_nowait())
+        return entries
+
+    async def _flush(self, entries: list[PendingWrite]):
+        try:
+            await write_entries(entries)
+        except Exception:
+            logger.exception('Cache write-behind flush of %s keys failed', len(entries))
+        cache_write_behind_queue.value = self.queue.qsize()
+
+    async def _run(self):
+        config = settings.cache_write_behind
+        while True:
+            self.pending = [await self.queue.get()]
+            # Даем накопиться пачке
+            if config.flush_interval > 0 and self.queue.qsize() < config.batch_size - 1:
+                await asyncio.sleep(config.flush_interval)
+            self.pending.extend(self._drain(config.batch_size - 1))
+            self.flushing = asyncio.ensure_future(self._flush(self.pending))
+            self.pending = []
+            await asyncio.shield(self.flushing)
+            self.flushing = None
+
+
+write_behind = WriteBehind()
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, BaseSettings
+from typing import Literal, Optional
+
+from pydantic import BaseModel, BaseSettings, Field, validator
 
 
 class Logging(BaseModel):
@@ -7,13 +9,256 @@ class Logging(BaseModel):
     level_console: str = 'DEBUG'
 
 
+class LocalCache(BaseModel):
+    enabled: bool = False
+    max_entries: int = 1024
+    max_bytes: int = 32 * 1024 * 1024
+    expire: int = 30
+
+
+class SharedCache(BaseModel):
+    enabled: bool = False
+    path: str = '/dev/shm/movies-cache'
+    # В Docker /dev/shm по умолчанию 64 МБ (--shm-size)
+    size: int = 32 * 1024 * 1024
+    slot_size: int = 8192
+    ways: int = 8
+    expire: int = 60
+
+
+class CacheLock(BaseModel):
+    enabled: bool = False
+    expire: float = 5.0
+    wait: float = 2.0
+    poll_interval: float = 0.05
+
+
+class StaleWhileRevalidate(BaseModel):
+    soft_expire: int = 300
+    hard_expire: int = 3600
+
+
+class CacheCoder(BaseModel):
+    # Сжатие значений BinaryCoder. По tests/benchmarks/bench_coder.py lz4 и
+    # zstd уменьшают значения в 1.4-3 раза, но разбор сжатого значения не
+    # быстрее несжатого: включать, когда важнее память Redis и сеть
+    compression: Literal['none', 'lz4', 'zstd'] = 'none'
+    compress_min_size: int = 1024
+    zstd_level: int = 3
+
+
+class ResponseCache(BaseModel):
+    enabled: bool = False
+    expire: int = 60
+
+
+class StaleIfError(BaseModel):
+    # Теневые копии удваивают объем кэша в Redis
+    enabled: bool = False
+    expire: int = 86400
+
+
+class CacheWriteBehind(BaseModel):
+    enabled: bool = False
+    max_size: int = 10000
+    batch_size: int = 100
+    flush_interval: float = 0.01
+    # Что делать при заполненной очереди: не кэшировать или писать сразу
+    overflow: Literal['drop', 'inline'] = 'drop'
+
+
+class CacheHealth(BaseModel):
+    enabled: bool = True
+    # Таймауты обращений к Redis
+    get_timeout: float = 0.1
+    set_timeout: float = 0.5
+    socket_timeout: float = 1.0
+    socket_connect_timeout: float = 1.0
+    # Обход кэша при доле ошибок или среднем времени обращений в окне
+    window: int = 100
+    min_samples: int = 20
+    error_ratio: float = 0.5
+    latency_threshold: float = 0.05
+    cooldown: float = 10.0
+
+
+class CacheTags(BaseModel):
+    enabled: bool = True
+    expire: int = 86400
+    stream: str = 'cache:invalidate'
+    stream_maxlen: int = 10000
+    # Время ожидания новых сообщений в XREAD, мс
+    block: int = 5000
+
+
+class HotKeys(BaseModel):
+    enabled: bool = True
+    # Количество отслеживаемых элементов каждой категории в воркере
+    capacity: int = 1000
+    interval: int = 60
+
+
+class Prefetch(BaseModel):
+    enabled: bool = False
+    # Упреждающих запросов в секунду на воркер и размер корзины токенов
+    rate: float = 10.0
+    burst: int = 20
+    max_inflight: int = 4
+    # Не запускать при большем количестве обрабатываемых запросов
+    max_active_requests: int = 32
+
+
+class DBBatch(BaseModel):
+    # Объединение одновременных get_by_id в один mget и поисков в один
+    # _msearch (db_managers.batcher), window - время накопления пакета в
+    # секундах, 0 - одна итерация цикла. Выключено по умолчанию: одиночный
+    # запрос ждет окно пакета и уходит в обертке mget/_msearch, выигрыш
+    # есть только при большом числе одновременных запросов
+    enabled: bool = False
+    window: float = 0.0
+    max_size: int = 100
+    search_enabled: bool = False
+    search_window: float = 0.0
+    search_max_size: int = 20
+
+
+class Elastic(BaseModel):
+    # Узлы кластера, пустой список - elastic_host:elastic_port
+    hosts: list[str] = []
+    # Соединений на узел в каждом воркере: всего к узлу открывается
+    # maxsize * количество воркеров gunicorn
+    maxsize: int = Field(10, ge=1)
+    http_compress: bool = False
+    # Таймаут запроса в секундах
+    timeout: float = Field(10.0, gt=0)
+    max_retries: int = Field(3, ge=0)
+    retry_on_timeout: bool = False
+    sniff_on_start: bool = False
+    sniff_on_connection_fail: bool = False
+    # Период обновления списка узлов в секундах, None - не обновлять
+    sniffer_timeout: Optional[float] = Field(None, gt=0)
+    # Сериализатор транспорта (db.elastic.SERIALIZERS)
+    serializer: Literal['json', 'orjson'] = 'orjson'
+
+    @validator('hosts', pre=True)
+    def split_hosts(cls, hosts):
+        # Из переменной окружения (ELASTIC__HOSTS) список приходит строкой
+        if isinstance(hosts, str):
+            return hosts.split(',')
+        return hosts
+
+    @validator('hosts', each_item=True)
+    def host_not_empty(cls, host: str) -> str:
+        host = host.strip()
+        if not host:
+            raise ValueError('empty Elasticsearch host')
+        return host
+
+
+class TrustedSource(BaseModel):
+    # Индексы, документы которых собираются в модели без валидации: данные
+    # уже проверены ETL (db_managers.construct)
+    indices: list[str] = ['movies', 'genres', 'persons']
+    # Доля ответов доверенных индексов, которые все равно валидируются
+    validate_rate: float = Field(0.01, ge=0, le=1)
+
+    @validator('indices', pre=True)
+    def split_indices(cls, indices):
+        if isinstance(indices, str):
+            return [index.strip() for index in indices.split(',') if index.strip()]
+        return indices
+
+
+class TotalHits(BaseModel):
+    # Подсчет общего количества результатов поиска (services.node):
+    # exact - точно в каждом запросе, capped - в каждом запросе до cap,
+    # off - не считать в поиске, брать из отдельного кэшируемого count
+    # (второй запрос к Elastic на холодной странице, и количество может
+    # расходиться со страницей до истечения кэша count). Сервисы могут
+    # переопределить режим для своих вызовов.
+    mode: Literal['off', 'capped', 'exact'] = 'capped'
+    cap: int = 10000
+
+
+class WarmupCall(BaseModel):
+    service: Literal['films', 'persons', 'genres']
+    method: str
+    kwargs: dict = {}
+    # Повторить вызов для каждого жанра (filter_genre)
+    per_genre: bool = False
+
+
+class TtlPolicy(BaseModel):
+    # Время жизни новой записи
+    expire: int
+    # Продлевать запись на expire при каждом попадании. Общее время жизни
+    # записи с момента ее создания не больше max_expire (и не больше
+    # cache_tags.expire, иначе запись переживет свои теги и не будет
+    # инвалидирована)
+    adaptive: bool = False
+    max_expire: int = 3600
+
+
+class CacheTtl(BaseModel):
+    # Политики по имени метода ('FilmService.search') или пространству имен
+    # ('movies' - get_by_id фильмов). Методы в режиме stale-while-revalidate
+    # живут по своим soft_expire/hard_expire, политики к ним не применяются.
+    policies: dict[str, TtlPolicy] = {
+        'genres': TtlPolicy(expire=3600),
+        'movies': TtlPolicy(expire=300, adaptive=True, max_expire=3600),
+        'persons': TtlPolicy(expire=300, adaptive=True, max_expire=3600),
+        'FilmService.search': TtlPolicy(expire=60, adaptive=True, max_expire=1800),
+        'PersonService.search': TtlPolicy(expire=60, adaptive=True, max_expire=1800),
+        'PersonService.get_movies_with_person': TtlPolicy(expire=300, adaptive=True, max_expire=3600),
+        # Количество результатов поиска (services.node), кэшируется отдельно
+        # от страниц и не продлевается
+        'count': TtlPolicy(expire=60),
+    }
+
+    def policy(self, function: str, namespace: str) -> Optional[TtlPolicy]:
+        return self.policies.get(function) or self.policies.get(namespace)
+
+
+class CacheWarmup(BaseModel):
+    enabled: bool = False
+    interval: int = 60
+    concurrency: int = 4
+    hot_calls: int = 50
+    calls: list[WarmupCall] = [
+        WarmupCall(service='genres', method='get_genres'),
+        WarmupCall(service='films', method='get_films', kwargs={'sort': '-imdb_rating'}),
+        WarmupCall(service='films', method='get_films', kwargs={'sort': '-imdb_rating', 'page_number': 2}),
+        WarmupCall(service='films', method='get_films', kwargs={'sort': '-imdb_rating'}, per_genre=True),
+        WarmupCall(service='persons', method='get_persons'),
+    ]
+
+
 class Settings(BaseSettings):
     project_name: str = 'movies'
     elastic_host: str = 'localhost'
     elastic_port: int = 9200
+    elastic: Elastic = Elastic()
     redis_host: str = 'localhost'
     redis_port: int = 6379
     cache_expire: int = 300
+    cache_ttl: CacheTtl = CacheTtl()
+    cache_key_max_length: int = 128
+    local_cache: LocalCache = LocalCache()
+    shared_cache: SharedCache = SharedCache()
+    cache_lock: CacheLock = CacheLock()
+    cache_swr: StaleWhileRevalidate = StaleWhileRevalidate()
+    stale_if_error: StaleIfError = StaleIfError()
+    cache_coder: CacheCoder = CacheCoder()
+    response_cache: ResponseCache = ResponseCache()
+    cache_write_behind: CacheWriteBehind = CacheWriteBehind()
+    cache_tags: CacheTags = CacheTags()
+    cache_health: CacheHealth = CacheHealth()
+    hot_keys: HotKeys = HotKeys()
+    cache_warmup: CacheWarmup = CacheWarmup()
+    prefetch: Prefetch = Prefetch()
+    db_batch: DBBatch = DBBatch()
+    total_hits: TotalHits = TotalHits()
+    trusted_source: TrustedSource = TrustedSource()
     logging: Logging = Logging()
     auth_url: str = 'http://127.0.0.1:5000/api/v1/user/is_authenticated'
 
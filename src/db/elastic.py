@@ -1,10 +1,128 @@
+import asyncio
+from types import SimpleNamespace
 from typing import Optional
 
-from elasticsearch import AsyncElasticsearch
+import aiohttp
+import orjson
+from elasticsearch import AIOHttpConnection, AsyncElasticsearch
+from elasticsearch.exceptions import SerializationError
+from elasticsearch.serializer import JSONSerializer
+
+from cache.metrics import Gauge, Histogram, registry
 
 es: Optional[AsyncElasticsearch] = None
 
 
+class PoolStats:
+    """Состояние пулов соединений Elastic в воркере (по всем узлам)."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.queued = 0
+
+    @staticmethod
+    def size() -> int:
+        if es is None:
+            return 0
+        return sum(
+            getattr(connection, 'maxsize', 0)
+            for connection in es.transport.connection_pool.connections
+        )
+
+    def utilization(self) -> float:
+        size = self.size()
+        return (self.in_flight - self.queued) / size if size else 0.0
+
+
+pool_stats = PoolStats()
+
+es_pool_size = registry.register(Gauge(
+    'es_pool_size', 'Elasticsearch connections allowed in this worker', function=pool_stats.size
+))
+es_pool_in_flight = registry.register(Gauge(
+    'es_pool_in_flight', 'Elasticsearch requests in progress, including queued',
+    function=lambda: pool_stats.in_flight,
+))
+es_pool_queued = registry.register(Gauge(
+    'es_pool_queued', 'Elasticsearch requests waiting for a free connection',
+    function=lambda: pool_stats.queued,
+))
+es_pool_utilization = registry.register(Gauge(
+    'es_pool_utilization', 'Share of Elasticsearch connections in use', function=pool_stats.utilization
+))
+es_pool_wait_seconds = registry.register(Histogram(
+    'es_pool_wait_seconds', 'Time spent waiting for a free Elasticsearch connection'
+)).labels()
+
+
+async def _on_queued_start(session, context: SimpleNamespace, params):
+    pool_stats.queued += 1
+    context.queued_at = asyncio.get_running_loop().time()
+
+
+async def _on_queued_end(session, context: SimpleNamespace, params):
+    pool_stats.queued -= 1
+    es_pool_wait_seconds.observe(asyncio.get_running_loop().time() - context.queued_at)
+
+
+def _pool_trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_queued_start.append(_on_queued_start)
+    trace_config.on_connection_queued_end.append(_on_queued_end)
+    trace_config.freeze()
+    return trace_config
+
+
+class MeteredConnection(AIOHttpConnection):
+    """Соединение с узлом Elastic, которое учитывает запросы в работе и
+    ожидание свободного соединения пула (maxsize) в метриках es_pool_*.
+
+    """
+    def __init__(self, *args, maxsize: int = 10, **kwargs):
+        super().__init__(*args, maxsize=maxsize, **kwargs)
+        self.maxsize = maxsize
+
+    async def _create_aiohttp_session(self):
+        await super()._create_aiohttp_session()
+        self.session.trace_configs.append(_pool_trace_config())
+
+    async def perform_request(self, *args, **kwargs):
+        pool_stats.in_flight += 1
+        try:
+            return await super().perform_request(*args, **kwargs)
+        finally:
+            pool_stats.in_flight -= 1
+
+
+class OrjsonSerializer(JSONSerializer):
+    """Сериализатор транспорта Elastic на orjson: ответы поиска разбираются в
+    несколько раз быстрее, чем стандартным json.
+
+    dumps возвращает str, как и JSONSerializer: клиент склеивает строки
+    при формировании тел bulk и msearch из списков.
+
+    """
+    def loads(self, s):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data):
+        if isinstance(data, (str, bytes)):
+            return data
+        try:
+            return orjson.dumps(data, default=self.default).decode()
+        except TypeError as e:
+            raise SerializationError(data, e)
+
+
+SERIALIZERS = {
+    'json': JSONSerializer,
+    'orjson': OrjsonSerializer,
+}
+
+
 # Функция понадобится при внедрении зависимостей
 async def get_elastic() -> AsyncElasticsearch:
     return es
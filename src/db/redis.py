@@ -2,6 +2,9 @@ from redis.asyncio.client import Redis
 
 
 redis: Redis | None = None
+# Отдельное подключение для блокирующего чтения stream инвалидации
+# (cache.tags.consume): у него нет socket_timeout основного подключения
+stream_redis: Redis | None = None
 
 
 # Функция понадобится при внедрении зависимостей
@@ -37,6 +37,25 @@ class AbstractDBManager(ABC):
 
         """
 
+    @abstractmethod
+    async def get_many(
+            self, table_name: str, object_ids: list[Any], model: Type[BaseModel]
+    ) -> list[Optional[BaseModel] | DBManagerError]:
+        """Поиск нескольких объектов в указанной таблице (индексе) одним
+        запросом.
+
+        Args:
+          table_name: название таблицы (индекса);
+          object_ids: список уникальных идентификаторов;
+          model: модель pydantic со списком нужных полей.
+
+        Returns:
+            Список экземпляров pydantic BaseModel в порядке object_ids, None
+            для ненайденных объектов. Ошибка по отдельному объекту
+            возвращается на его месте экземпляром DBManagerError.
+
+        """
+
     @abstractmethod
     async def search_all(
             self,
@@ -60,3 +79,39 @@ class AbstractDBManager(ABC):
                 термин из Elastic, при желании можно реализовать и для SQL).
 
         """
+
+    @abstractmethod
+    async def count(self, table_name: str, query: Any) -> int:
+        """Количество записей в указанной таблице (индексе), подходящих под
+        условие.
+
+        Args:
+          table_name: название таблицы (индекса);
+          query: условие отбора, без пагинации и сортировки.
+
+        Returns:
+            Количество записей.
+
+        """
+
+    @abstractmethod
+    async def search_many(
+            self,
+            table_name: str,
+            model: Type[BaseModel],
+            queries: list[Any],
+    ) -> list[tuple[list[Optional[BaseModel]], int, list] | DBManagerError]:
+        """Несколько вызовов search_all к одной таблице (индексу) одним
+        запросом к БД.
+
+        Args:
+          table_name: название таблицы (индекса);
+          model: модель pydantic со списком нужных полей;
+          queries: список сформированных тел запросов.
+
+        Returns:
+            Результаты в порядке queries, как у search_all. Ошибка отдельного
+            запроса возвращается на месте результата экземпляром
+            DBManagerError.
+
+        """
@@ -0,0 +1,221 @@
+"""Объединение одновременных запросов объектов по id (в духе DataLoader).
+
+Под нагрузкой параллельные запросы вызывают get_by_id с разными id одного
+индекса с разницей в миллисекунды, и каждый из них - отдельный GET в Elastic.
+BatchLoader копит ключи, запрошенные в течение одной итерации цикла событий
+(или окна window секунд), загружает их одним пакетом (mget) и раздает
+результаты вызывающим. Так же объединяются поисковые запросы (_msearch).
+
+Заполнение пакетов видно в метриках db_batch_size и db_batches_total (по
+причине отправки: full - пакет заполнен, window - истекло окно).
+
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Optional, Type
+
+import orjson
+from pydantic import BaseModel
+
+from cache.metrics import Counter, Histogram, registry
+from db_managers.abstract_manager import AbstractDBManager, DBManagerError
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+BATCH_LABELS = ('operation', 'index')
+
+db_batch_size = registry.register(Histogram(
+    'db_batch_size', 'Keys per batched database request', BATCH_LABELS, buckets=BATCH_BUCKETS
+))
+db_batches = registry.register(Counter(
+    'db_batches_total', 'Batched database requests by dispatch trigger', BATCH_LABELS + ('trigger',)
+))
+
+
+class BatchLoader:
+    def __init__(
+            self,
+            load_many: Callable[[list], Awaitable[list]],
+            window: float = 0.0,
+            max_size: int = 100,
+            labels: tuple[str, str] = ('', ''),
+    ):
+        """Загрузчик, объединяющий одновременные вызовы load в пакеты.
+
+        Args:
+          load_many: корутина, которая получает список ключей и возвращает
+            значения в том же порядке, значение-исключение передается
+            вызывающему как ошибка;
+          window: время накопления пакета в секундах, 0 - до конца текущей
+            итерации цикла событий;
+          max_size: максимальный размер пакета, заполненный пакет
+            отправляется сразу;
+          labels: метки метрик (операция, индекс).
+
+        """
+        self.load_many = load_many
+        self.window = window
+        self.max_size = max_size
+        self.batch_size = db_batch_size.labels(*labels)
+        self.full_batches = db_batches.labels(*labels, 'full')
+        self.window_batches = db_batches.labels(*labels, 'window')
+        self._pending: dict[Hashable, tuple[Any, list[asyncio.Future]]] = {}
+        self._handle: Optional[asyncio.Handle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable, item: Any = None) -> Any:
+        """Значение по ключу. Одинаковые ключи в пакете загружаются один раз.
+
+        Args:
+          key: ключ, пр. id объекта;
+          item: что передать в load_many вместо ключа, пр. тело запроса,
+            ключом которого служит его сериализованная копия.
+
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = (key if item is None else item, [])
+        pending[1].append(future)
+
+        if len(self._pending) >= self.max_size:
+            self.full_batches.inc()
+            self._dispatch()
+        elif self._handle is None:
+            if self.window > 0:
+                self._handle = loop.call_later(self.window, self._dispatch_window)
+            else:
+                self._handle = loop.call_soon(self._dispatch_window)
+
+        return await future
+
+    def _dispatch_window(self):
+        self._handle = None
+        self.window_batches.inc()
+        self._dispatch()
+
+    def _dispatch(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        self.batch_size.observe(len(batch))
+
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[Hashable, tuple[Any, list[asyncio.Future]]]):
+        items = [item for item, _ in batch.values()]
+        try:
+            values = await self.load_many(items)
+            if len(values) != len(items):
+                raise ValueError(
+                    'load_many returned {} values for {} keys'.format(len(values), len(items))
+                )
+        except BaseException as e:
+            for _, futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            if isinstance(e, (asyncio.CancelledError, KeyboardInterrupt, SystemExit)):
+                raise
+            return
+
+        for (_, futures), value in zip(batch.values(), values):
+            for future in futures:
+                # Вызывающий мог быть отменен, пока шла загрузка
+                if future.done():
+                    continue
+                if isinstance(value, BaseException):
+                    future.set_exception(value)
+                else:
+                    future.set_result(value)
+
+
+class BatchingDBManager(AbstractDBManager):
+    def __init__(
+            self,
+            db_manager: AbstractDBManager,
+            window: float = 0.0,
+            max_size: int = 100,
+            search_window: Optional[float] = None,
+            search_max_size: int = 20,
+    ):
+        """Обертка над AbstractDBManager: одновременные вызовы get для одной
+        таблицы (индекса) и модели объединяются в один get_many, вызовы
+        search_all - в один search_many.
+
+        Args:
+          db_manager: менеджер БД, которому передаются запросы;
+          window: время накопления пакета get в секундах (см. BatchLoader);
+          max_size: максимальный размер пакета get;
+          search_window: время накопления пакета search_all в секундах, None -
+            поисковые запросы не объединяются;
+          search_max_size: максимальный размер пакета search_all.
+
+        """
+        self.db_manager = db_manager
+        self.window = window
+        self.max_size = max_size
+        self.search_window = search_window
+        self.search_max_size = search_max_size
+        self._loaders: dict[tuple[str, Type[BaseModel]], BatchLoader] = {}
+        self._search_loaders: dict[tuple[str, Type[BaseModel]], BatchLoader] = {}
+
+    def _loader(self, table_name: str, model: Type[BaseModel]) -> BatchLoader:
+        loader = self._loaders.get((table_name, model))
+        if loader is None:
+            async def load_many(object_ids: list) -> list[Optional[BaseModel] | DBManagerError]:
+                return await self.db_manager.get_many(table_name, object_ids, model)
+
+            loader = self._loaders[(table_name, model)] = BatchLoader(
+                load_many, window=self.window, max_size=self.max_size, labels=('mget', table_name)
+            )
+        return loader
+
+    def _search_loader(self, table_name: str, model: Type[BaseModel]) -> BatchLoader:
+        """Загрузчик поисковых запросов. Ключ - сериализованное тело запроса,
+        так одинаковые запросы выполняются один раз.
+
+        """
+        loader = self._search_loaders.get((table_name, model))
+        if loader is None:
+            async def load_many(queries: list[dict]) -> list:
+                return await self.db_manager.search_many(table_name, model, queries)
+
+            loader = self._search_loaders[(table_name, model)] = BatchLoader(
+                load_many,
+                window=self.search_window,
+                max_size=self.search_max_size,
+                labels=('msearch', table_name),
+            )
+        return loader
+
+    async def get(
+            self, table_name: str, object_id: Any, model: Type[BaseModel]
+    ) -> Optional[BaseModel]:
+        return await self._loader(table_name, model).load(object_id)
+
+    async def get_many(
+            self, table_name: str, object_ids: list[Any], model: Type[BaseModel]
+    ) -> list[Optional[BaseModel] | DBManagerError]:
+        return await self.db_manager.get_many(table_name, object_ids, model)
+
+    async def search_all(
+            self, table_name: str, model: Type[BaseModel], query: Any
+    ) -> tuple[list[Optional[BaseModel]], int, list]:
+        if self.search_window is None:
+            return await self.db_manager.search_all(table_name, model, query)
+        return await self._search_loader(table_name, model).load(
+            orjson.dumps(query, option=orjson.OPT_SORT_KEYS), query
+        )
+
+    async def count(self, table_name: str, query: Any) -> int:
+        return await self.db_manager.count(table_name, query)
+
+    async def search_many(
+            self, table_name: str, model: Type[BaseModel], queries: list[Any]
+    ) -> list[tuple[list[Optional[BaseModel]], int, list] | DBManagerError]:
+        return await self.db_manager.search_many(table_name, model, queries)
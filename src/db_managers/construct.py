@@ -0,0 +1,54 @@
+"""Сборка моделей pydantic без валидации для доверенных данных.
+
+BaseModel.construct не валидирует значения, но и не собирает вложенные
+модели: списки жанров и персон фильма остались бы словарями. construct
+отсюда проходит по вложенным моделям рекурсивно. Значения не приводятся к
+типам полей (пр. id остаются строками, а не UUID), лишние поля документа
+отбрасываются, отсутствующие получают значения по умолчанию.
+
+"""
+from functools import lru_cache
+from typing import Optional, Type, TypeVar
+
+from pydantic import BaseModel
+from pydantic.fields import MAPPING_LIKE_SHAPES
+
+Model = TypeVar('Model', bound=BaseModel)
+
+
+@lru_cache(maxsize=None)
+def _plan(model: Type[BaseModel]) -> tuple[tuple[str, str, Optional[Type[BaseModel]]], ...]:
+    """Поля модели: имя, псевдоним и вложенная модель (если есть)."""
+    plan = []
+    for name, field in model.__fields__.items():
+        nested = field.type_
+        if not (
+                isinstance(nested, type)
+                and issubclass(nested, BaseModel)
+                and field.shape not in MAPPING_LIKE_SHAPES
+        ):
+            nested = None
+        plan.append((name, field.alias, nested))
+    return tuple(plan)
+
+
+def construct(model: Type[Model], data: dict) -> Model:
+    """Модель из словаря без валидации, включая вложенные модели.
+
+    Args:
+      model: модель pydantic;
+      data: данные, уже прошедшие проверку (пр. документ Elastic после ETL).
+
+    """
+    values = {}
+    for name, alias, nested in _plan(model):
+        if alias not in data:
+            continue
+        value = data[alias]
+        if nested is not None:
+            if isinstance(value, dict):
+                value = construct(nested, value)
+            elif isinstance(value, list):
+                value = [construct(nested, item) if isinstance(item, dict) else item for item in value]
+        values[name] = value
+    return model.construct(**values)
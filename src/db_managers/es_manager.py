@@ -1,23 +1,125 @@
-from typing import Optional, Type
+import logging
+import random
+from functools import lru_cache
+from typing import Any, Collection, Optional, Type
 from uuid import UUID
 
+import orjson
 from elasticsearch import (AsyncElasticsearch, ElasticsearchException,
                            NotFoundError)
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import MAPPING_LIKE_SHAPES
 
+from cache.metrics import Counter, registry
 from db_managers.abstract_manager import AbstractDBManager, DBManagerError
+from db_managers.construct import construct
+
+logger = logging.getLogger(__name__)
+
+# Из ответов Elastic берем только то, что читает ESDBManager: без _index,
+# _score, _shards и прочих метаданных ответы меньше и быстрее разбираются
+GET_FILTER_PATH = ('_source',)
+MGET_FILTER_PATH = ('docs.found', 'docs._source', 'docs.error')
+# Ошибки mget по отдельному документу, которые означают, что его нет
+MGET_NOT_FOUND_ERRORS = {'index_not_found_exception'}
+SEARCH_FILTER_PATH = ('hits.total.value', 'hits.hits._source', 'hits.hits.sort')
+COUNT_FILTER_PATH = ('count',)
+MSEARCH_FILTER_PATH = tuple(
+    'responses.{}'.format(path) for path in SEARCH_FILTER_PATH + ('error', 'status')
+)
+
+es_documents = registry.register(Counter(
+    'es_documents_total', 'Elasticsearch documents parsed by mode (validated or trusted)', ('index', 'mode')
+))
+es_validation_errors = registry.register(Counter(
+    'es_validation_errors_total', 'Sampled validations of trusted indices that failed', ('index',)
+))
+
+
+@lru_cache(maxsize=None)
+def source_fields(model: Type[BaseModel]) -> tuple[str, ...]:
+    """Поля документа, нужные модели, для фильтрации _source. Вложенные
+    модели (в том числе в списках) раскрываются в пути через точку, пр.
+    actors.id. Так из Elastic не загружаются и не разбираются поля, которые
+    модель все равно отбросит.
+
+    Args:
+      model: модель pydantic.
+
+    """
+    fields = []
+    for field in model.__fields__.values():
+        nested = field.type_
+        if (
+                isinstance(nested, type)
+                and issubclass(nested, BaseModel)
+                and field.shape not in MAPPING_LIKE_SHAPES
+        ):
+            fields.extend('{}.{}'.format(field.alias, name) for name in source_fields(nested))
+        else:
+            fields.append(field.alias)
+    return tuple(fields)
+
+
+def _project(query: dict, model: Type[BaseModel]) -> dict:
+    """Тело запроса с фильтрацией _source по модели, если фильтр не задан
+    явно."""
+    if '_source' in query:
+        return query
+    return {**query, '_source': source_fields(model)}
 
 
 class ESDBManager(AbstractDBManager):
-    def __init__(self, elastic: AsyncElasticsearch):
+    def __init__(
+            self,
+            elastic: AsyncElasticsearch,
+            trusted: Collection[str] = (),
+            validate_rate: float = 0.0,
+    ):
         """Реализация AbstractDBManager для работы с Elastic. Перехватывает
         корневое исключение ElasticsearchException и меняет на DBManagerError.
 
+        Из документов запрашиваются только поля переданной модели (см.
+        source_fields).
+
+        Документы доверенных индексов (данные в них уже проверены ETL)
+        собираются в модели без валидации (db_managers.construct). Доля
+        ответов validate_rate все равно валидируется: ошибки попадают в лог и
+        метрику es_validation_errors_total, а запрос завершается
+        DBManagerError - невалидные данные не отдаются.
+
         Args:
           elastic: инициализированное подключение к БД;
+          trusted: доверенные индексы;
+          validate_rate: доля ответов доверенных индексов, которые
+            валидируются (от 0 до 1).
 
         """
         self.elastic = elastic
+        self.trusted = frozenset(trusted)
+        self.validate_rate = validate_rate
+
+    def _parse(
+            self, table_name: str, model: Type[BaseModel], sources: list[dict]
+    ) -> list[BaseModel]:
+        """Модели из документов одного ответа."""
+        if table_name not in self.trusted:
+            es_documents.labels(table_name, 'validated').inc(len(sources))
+            return [model.parse_obj(source) for source in sources]
+
+        if self.validate_rate and random.random() < self.validate_rate:
+            try:
+                models = [model.parse_obj(source) for source in sources]
+            except ValidationError as e:
+                # Расхождение схемы, пойманное выборкой, не отдаем клиенту
+                es_validation_errors.labels(table_name).inc()
+                logger.warning('Trusted index %s returned invalid %s: %s', table_name, model.__name__, e)
+                raise DBManagerError('Invalid {} in index {}: {}'.format(model.__name__, table_name, e))
+            es_documents.labels(table_name, 'validated').inc(len(sources))
+            return models
+
+        es_documents.labels(table_name, 'trusted').inc(len(sources))
+        return [construct(model, source) for source in sources]
 
     async def get(
             self, table_name: str, object_id: UUID, model: Type[BaseModel]
@@ -36,13 +138,72 @@ class ESDBManager(AbstractDBManager):
         """
         try:
             # Приводим id к строке ради корректной подсветки синтаксиса
-            doc = await self.elastic.get(index=table_name, id=str(object_id))
-            return model(**doc['_source'])
+            doc = await self.elastic.get(
+                index=table_name,
+                id=str(object_id),
+                _source_includes=source_fields(model),
+                filter_path=GET_FILTER_PATH,
+            )
+            return self._parse(table_name, model, [doc['_source']])[0]
         except NotFoundError:
             return None
         except ElasticsearchException as e:
             raise DBManagerError('ElasticsearchException: {}'.format(e))
 
+    async def get_many(
+            self, table_name: str, object_ids: list[UUID], model: Type[BaseModel]
+    ) -> list[Optional[BaseModel] | DBManagerError]:
+        """Поиск нескольких объектов в указанном индексе одним запросом
+        mget.
+
+        Args:
+          table_name: название индекса;
+          object_ids: список уникальных идентификаторов (UUID);
+          model: модель pydantic со списком нужных полей.
+
+        Returns:
+            Список экземпляров pydantic BaseModel в порядке object_ids, None
+            для ненайденных объектов (в том числе при отсутствии индекса).
+            Прочие ошибки по отдельному документу возвращаются на его месте
+            экземпляром DBManagerError, как в search_many: так ошибка одного
+            документа не ломает остальные запросы пакета (BatchingDBManager).
+
+        """
+        if not object_ids:
+            return []
+
+        try:
+            docs = await self.elastic.mget(
+                index=table_name,
+                body={'ids': [str(object_id) for object_id in object_ids]},
+                _source_includes=source_fields(model),
+                filter_path=MGET_FILTER_PATH,
+            )
+        except NotFoundError:
+            return [None] * len(object_ids)
+        except ElasticsearchException as e:
+            raise DBManagerError('ElasticsearchException: {}'.format(e))
+
+        results = []
+        for doc in docs['docs']:
+            if doc.get('found'):
+                # Документы разбираются по одному: невалидный документ -
+                # ошибка только его вызывающего (BatchingDBManager)
+                try:
+                    results.append(self._parse(table_name, model, [doc['_source']])[0])
+                except DBManagerError as e:
+                    results.append(e)
+            elif 'error' not in doc or self._error_type(doc['error']) in MGET_NOT_FOUND_ERRORS:
+                results.append(None)
+            else:
+                # Ошибка по отдельному документу (пр. недоступен шард)
+                results.append(DBManagerError('Elasticsearch mget error: {}'.format(doc['error'])))
+        return results
+
+    @staticmethod
+    def _error_type(error: Any) -> Optional[str]:
+        return error.get('type') if isinstance(error, dict) else None
+
     async def search_all(
             self,
             table_name: str,
@@ -64,22 +225,102 @@ class ESDBManager(AbstractDBManager):
         Returns:
             Кортеж из трех значений:
               - список моделей pydantic BaseModel с данными из БД;
-              - общее количество найденных записей (без учета пагинации);
+              - общее количество найденных записей (без учета пагинации),
+                None если подсчет отключен в запросе (track_total_hits);
               - значение search_after (стартовое значение для следующей выдачи,
                 термин из Elastic, при желании можно реализовать и для SQL).
 
         """
         try:
-            docs = await self.elastic.search(index=table_name, body=query)
-            hits = docs['hits']['hits']
-            if hits:
-                models = [model.parse_obj(doc['_source']) for doc in hits]
-                search_after = docs['hits']['hits'][-1].get("sort", None)
-                total = docs['hits']['total']['value']
-                return models, total, search_after
+            docs = await self.elastic.search(
+                index=table_name, body=_project(query, model), filter_path=SEARCH_FILTER_PATH
+            )
+            return self._parse_hits(docs, table_name, model)
+        except NotFoundError:
             return [], 0, None
+        except ElasticsearchException as e:
+            raise DBManagerError('ElasticsearchException: {}'.format(e))
+
+    async def count(self, table_name: str, query: dict) -> int:
+        """Реализация абстрактного метода. Количество документов индекса,
+        подходящих под условие, запросом _count.
+
+        Args:
+          table_name: название индекса;
+          query: условие отбора (содержимое поля query тела запроса).
+
+        Returns:
+            Количество документов.
 
+        """
+        try:
+            docs = await self.elastic.count(
+                index=table_name, body={'query': query}, filter_path=COUNT_FILTER_PATH
+            )
+            return docs['count']
         except NotFoundError:
-            return [], 0, None
+            return 0
+        except ElasticsearchException as e:
+            raise DBManagerError('ElasticsearchException: {}'.format(e))
+
+    async def search_many(
+            self,
+            table_name: str,
+            model: Type[BaseModel],
+            queries: list[dict],
+    ) -> list[tuple[list[Optional[BaseModel]], int, list | None] | DBManagerError]:
+        """Реализация абстрактного метода. Несколько поисковых запросов к
+        индексу одним запросом _msearch.
+
+        Args:
+          table_name: название индекса;
+          model: модель pydantic со списком нужных полей;
+          queries: сформированные тела запросов.
+
+        Returns:
+            Результаты в порядке queries, как у search_all. Ошибка отдельного
+            запроса возвращается на месте результата экземпляром
+            DBManagerError.
+
+        """
+        if not queries:
+            return []
+
+        body = b''.join(b'{}\n' + orjson.dumps(_project(query, model)) + b'\n' for query in queries)
+        try:
+            docs = await self.elastic.msearch(
+                index=table_name, body=body, filter_path=MSEARCH_FILTER_PATH
+            )
+        except NotFoundError:
+            return [([], 0, None)] * len(queries)
         except ElasticsearchException as e:
             raise DBManagerError('ElasticsearchException: {}'.format(e))
+
+        results = []
+        for response in docs['responses']:
+            if 'error' not in response:
+                try:
+                    results.append(self._parse_hits(response, table_name, model))
+                except DBManagerError as e:
+                    results.append(e)
+            elif response.get('status') == 404:
+                results.append(([], 0, None))
+            else:
+                results.append(DBManagerError('Elasticsearch msearch error: {}'.format(response['error'])))
+        return results
+
+    def _parse_hits(
+            self, docs: dict, table_name: str, model: Type[BaseModel]
+    ) -> tuple[list[Optional[BaseModel]], int, list | None]:
+        """Разбор ответа _search: модели, общее количество и search_after.
+        С filter_path пустые части ответа (пр. hits.hits без результатов)
+        отсутствуют.
+
+        """
+        hits = docs.get('hits', {})
+        if hits.get('hits'):
+            models = self._parse(table_name, model, [doc['_source'] for doc in hits['hits']])
+            search_after = hits['hits'][-1].get("sort", None)
+            total = hits['total']['value'] if 'total' in hits else None
+            return models, total, search_after
+        return [], 0, None
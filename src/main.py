@@ -1,3 +1,5 @@
+import asyncio
+import logging
 from logging import config as logging_config
 
 import redis.asyncio as aioredis
@@ -6,11 +8,15 @@ from elasticsearch import AsyncElasticsearch
 from fastapi import FastAPI, Request, status
 from fastapi.responses import ORJSONResponse
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 
-from api.v1 import films, genres, persons
-from cache.coder import JsonCoder
+from api import metrics
+from api.v1 import admin, films, genres, persons
+from cache import local, shared, stale, tags, warmup
+from cache.backend import BACKEND_ERRORS, RedisBatchBackend
+from cache.coder import BinaryCoder
+from cache.hot_calls import hot_calls
 from cache.key_builder import key_builder
+from cache.write_behind import write_behind
 from core.auth import AuthError, check_auth_url
 from core.backoff import BackoffError
 from core.config import settings
@@ -19,6 +25,7 @@ from db import elastic, redis
 from db_managers.abstract_manager import DBManagerError
 
 logging_config.dictConfig(LOGGING)
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title=settings.project_name,
@@ -41,32 +48,94 @@ async def db_exception_handler(request: Request, exc: DBManagerError):
     )
 
 
-@app.on_event("startup")
-async def startup():
+async def init_connections():
+    """Подключения к Redis и Elastic, инициализация кэша. Используется и вне
+    приложения, пр. в CLI прогрева кэша (cache.warmup).
+
+    """
     redis.redis = await aioredis.from_url(
         f"redis://{settings.redis_host}:{settings.redis_port}",
-        encoding="utf8",
-        decode_responses=True,
         max_connections=20,
+        socket_timeout=settings.cache_health.socket_timeout,
+        socket_connect_timeout=settings.cache_health.socket_connect_timeout,
+    )
+    # socket_timeout служит и таймаутом блокирующих команд: XREAD с block
+    # дольше него обрывался бы ошибкой на каждом простое stream
+    redis.stream_redis = await aioredis.from_url(
+        f"redis://{settings.redis_host}:{settings.redis_port}",
+        max_connections=2,
+        socket_timeout=None,
+        socket_connect_timeout=settings.cache_health.socket_connect_timeout,
     )
     FastAPICache.init(
-        RedisBackend(redis.redis),
+        RedisBatchBackend(redis.redis),
         prefix="cache",
-        coder=JsonCoder,
+        coder=BinaryCoder,
         expire=settings.cache_expire,
         key_builder=key_builder
     )
+    if settings.local_cache.enabled:
+        local.local_cache = local.LocalCache(
+            max_entries=settings.local_cache.max_entries,
+            max_bytes=settings.local_cache.max_bytes,
+        )
+    if settings.shared_cache.enabled:
+        shared.shared_cache = shared.SharedCache(
+            path=settings.shared_cache.path,
+            size=settings.shared_cache.size,
+            slot_size=settings.shared_cache.slot_size,
+            ways=settings.shared_cache.ways,
+        )
     elastic.es = AsyncElasticsearch(
-        hosts=[f"{settings.elastic_host}:{settings.elastic_port}"]
+        hosts=settings.elastic.hosts or [f"{settings.elastic_host}:{settings.elastic_port}"],
+        connection_class=elastic.MeteredConnection,
+        serializer=elastic.SERIALIZERS[settings.elastic.serializer](),
+        maxsize=settings.elastic.maxsize,
+        http_compress=settings.elastic.http_compress,
+        timeout=settings.elastic.timeout,
+        max_retries=settings.elastic.max_retries,
+        retry_on_timeout=settings.elastic.retry_on_timeout,
+        sniff_on_start=settings.elastic.sniff_on_start,
+        sniff_on_connection_fail=settings.elastic.sniff_on_connection_fail,
+        sniffer_timeout=settings.elastic.sniffer_timeout,
     )
 
 
-@app.on_event("shutdown")
-async def shutdown():
+async def close_connections():
+    if shared.shared_cache is not None:
+        shared.shared_cache.close()
+        shared.shared_cache = None
     await redis.redis.close()
+    await redis.stream_redis.close()
     await elastic.es.close()
 
 
+@app.on_event("startup")
+async def startup():
+    await init_connections()
+    app.state.invalidation = asyncio.create_task(tags.consume(redis.stream_redis))
+    app.state.warmup = asyncio.create_task(warmup.run_periodic())
+    if settings.hot_keys.enabled:
+        app.state.hot_keys = asyncio.create_task(hot_calls.run_periodic(redis.redis))
+    if settings.cache_write_behind.enabled:
+        write_behind.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    logger.info('Cache stats: %s', local.stats.report())
+    app.state.invalidation.cancel()
+    app.state.warmup.cancel()
+    if settings.hot_keys.enabled:
+        app.state.hot_keys.cancel()
+        try:
+            await hot_calls.flush(redis.redis)
+        except BACKEND_ERRORS:
+            pass
+    await write_behind.stop()
+    await close_connections()
+
+
 @app.middleware('http')
 async def authenticate_user(request: Request, call_next):
     """Используем декоратор middleware('http'):
@@ -89,9 +158,25 @@ async def authenticate_user(request: Request, call_next):
     return response
 
 
+@app.middleware('http')
+async def mark_stale_response(request: Request, call_next):
+    """Помечаем ответы, собранные из теневых копий кэша при ошибке БД (см.
+    cache.stale). Признак нужно создать до call_next: обработчик выполняется
+    в отдельной задаче с копией контекста.
+
+    """
+    mark = stale.begin()
+    response = await call_next(request)
+    if mark.stale:
+        response.headers[stale.STALE_HEADER] = stale.STALE_VALUE
+    return response
+
+
 app.include_router(films.router, prefix="/api/v1/films", tags=["films"])
 app.include_router(persons.router, prefix="/api/v1/persons", tags=["persons"])
 app.include_router(genres.router, prefix="/api/v1/genres", tags=["genres"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
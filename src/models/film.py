@@ -4,20 +4,30 @@ from models.node import Node
 
 
 class Genre(Node):
+    cache_tag = 'genre'
+
     id: UUID
     name: str
 
 
 class Person(Node):
+    cache_tag = 'person'
+
     id: UUID
     name: str
 
 
-class Film(Node):
+class FilmShort(Node):
+    """Фильм в списках: из Elastic загружаются только эти поля."""
+    cache_tag = 'film'
+
     id: str
     title: str
     imdb_rating: float
     length: int
+
+
+class Film(FilmShort):
     description: str
     genre: list[Genre]
     actors: list[Person]
@@ -25,7 +35,23 @@ class Film(Node):
     directors: list[Person]
 
 
+class StaffMember(Node):
+    id: UUID
+
+
+class FilmStaff(Node):
+    """Фильм в списке фильмов персоны: поля списка и id участников для
+    определения ролей."""
+    id: str
+    title: str
+    imdb_rating: float
+    length: int
+    actors: list[StaffMember]
+    writers: list[StaffMember]
+    directors: list[StaffMember]
+
+
 class FilmsList(Node):
     count: int
     next: str | None
-    results: list[Film]
+    results: list[FilmShort]
@@ -3,13 +3,19 @@ from uuid import UUID
 from models.node import Node
 
 
-class Genre(Node):
+class GenreShort(Node):
+    """Жанр в списках: из Elastic загружаются только эти поля."""
+    cache_tag = 'genre'
+
     id: UUID
     name: str
+
+
+class Genre(GenreShort):
     films_count: int
     description: str
 
 
 class GenresList(Node):
     count: int
-    results: list[Genre]
+    results: list[GenreShort]
@@ -1,3 +1,5 @@
+from typing import ClassVar, Optional
+
 import orjson
 from pydantic import BaseModel
 
@@ -5,6 +7,22 @@ from core.json import orjson_dumps
 
 
 class Node(BaseModel):
+    # Тег для инвалидации кэша по id объекта (см. cache.tags)
+    cache_tag: ClassVar[Optional[str]] = None
+
     class Config:
         json_loads = orjson.loads
         json_dumps = orjson_dumps
+
+
+class Total(Node):
+    """Общее количество результатов поиска (кэшируется отдельно от
+    страниц). Тег 'count:<тег сущностей индекса>' (пр. 'count:film')
+    снимается при изменении любой сущности этого типа (см. cache.tags).
+
+    """
+    cache_tag = 'count'
+
+    count: int
+    # Тег сущностей индекса, по которому считали (пр. 'film')
+    id: Optional[str] = None
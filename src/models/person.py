@@ -15,6 +15,8 @@ class Roles(Node):
 
 
 class Person(Node):
+    cache_tag = 'person'
+
     id: UUID
     name: str
 
@@ -6,12 +6,12 @@ from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 
 from cache.pydantic_cache import pydantic_cache
+from core.config import settings
 from db.elastic import get_elastic
 from db_managers.abstract_manager import AbstractDBManager
-from db_managers.es_manager import ESDBManager
 from elastic_requests.bool_query import must_query_factory
-from models.film import Film, FilmsList
-from services.node import NodeService
+from models.film import Film, FilmShort, FilmsList
+from services.node import NodeService, es_db_manager, next_page
 
 
 class FilmService(NodeService):
@@ -30,7 +30,12 @@ class FilmService(NodeService):
         self.Node = Film
         self.index = 'movies'
 
-    @pydantic_cache(model=FilmsList)
+    @pydantic_cache(
+        model=FilmsList,
+        soft_expire=settings.cache_swr.soft_expire,
+        hard_expire=settings.cache_swr.hard_expire,
+        prefetch=next_page,
+    )
     async def get_films(
             self,
             sort: str = '',
@@ -69,7 +74,7 @@ class FilmService(NodeService):
         )
 
         models, total, search_after = await self._get_from_elastic(
-            query=query_obj.body,
+            query=query_obj.body, model=FilmShort
         )
 
         return FilmsList(
@@ -78,7 +83,7 @@ class FilmService(NodeService):
             results=models
         )
 
-    @pydantic_cache(model=FilmsList)
+    @pydantic_cache(model=FilmsList, prefetch=next_page)
     async def search(
             self,
             search: str,
@@ -110,7 +115,7 @@ class FilmService(NodeService):
         )
 
         models, total, search_after = await self._get_from_elastic(
-            query_obj.body
+            query_obj.body, model=FilmShort
         )
 
         return FilmsList(
@@ -124,5 +129,4 @@ class FilmService(NodeService):
 def get_film_service(
         elastic: AsyncElasticsearch = Depends(get_elastic),
 ) -> FilmService:
-    es_db_manager = ESDBManager(elastic)
-    return FilmService(es_db_manager)
+    return FilmService(es_db_manager(elastic))
@@ -4,12 +4,12 @@ from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 
 from cache.pydantic_cache import pydantic_cache
+from core.config import settings
 from db.elastic import get_elastic
 from db_managers.abstract_manager import AbstractDBManager
-from db_managers.es_manager import ESDBManager
 from elastic_requests.bool_query import must_query_factory
-from models.genre import Genre, GenresList
-from services.node import NodeService
+from models.genre import Genre, GenreShort, GenresList
+from services.node import NodeService, es_db_manager
 
 
 class GenreService(NodeService):
@@ -19,7 +19,12 @@ class GenreService(NodeService):
         self.Node = Genre
         self.index = 'genres'
 
-    @pydantic_cache(model=GenresList)
+    @pydantic_cache(
+        model=GenresList,
+        local_cache=True,
+        soft_expire=settings.cache_swr.soft_expire,
+        hard_expire=settings.cache_swr.hard_expire,
+    )
     async def get_genres(
             self, size: int = 10, page_number: int = 1
     ) -> GenresList | None:
@@ -34,8 +39,9 @@ class GenreService(NodeService):
             size=size, page_number=page_number, sort='name.raw'
         )
 
+        # Жанров немного: точный подсчет дешев, а по нему строятся страницы
         models, total, search_after = await self._get_from_elastic(
-            query=query_obj.body,
+            query=query_obj.body, model=GenreShort, total_hits='exact'
         )
 
         if not models:
@@ -48,5 +54,4 @@ class GenreService(NodeService):
 def get_genre_service(
     elastic: AsyncElasticsearch = Depends(get_elastic),
 ) -> GenreService:
-    es_db_manager = ESDBManager(elastic)
-    return GenreService(es_db_manager)
+    return GenreService(es_db_manager(elastic))
@@ -1,3 +1,4 @@
+import asyncio
 from base64 import urlsafe_b64decode, urlsafe_b64encode
 from typing import Optional
 from uuid import UUID
@@ -5,8 +6,47 @@ from uuid import UUID
 from orjson import dumps, loads
 from pydantic import BaseModel
 
+from elasticsearch import AsyncElasticsearch
+
 from cache.pydantic_cache import pydantic_cache
-from db_managers.abstract_manager import AbstractDBManager
+from core.config import settings
+from db_managers.abstract_manager import AbstractDBManager, DBManagerError
+from db_managers.batcher import BatchingDBManager
+from db_managers.es_manager import ESDBManager
+from models.node import Total
+
+
+def next_page(params: dict, value: BaseModel) -> Optional[dict]:
+    """Аргументы запроса следующей страницы по курсору next, для
+    упреждающей загрузки (prefetch в pydantic_cache). Курсор декодируется так
+    же, как из URL, поэтому ключ кэша совпадет с ключом следующего запроса.
+
+    """
+    cursor = getattr(value, 'next', None)
+    if not cursor:
+        return None
+    return {**params, 'search_after': NodeService.b64decode_sync(cursor)}
+
+
+def es_db_manager(elastic: AsyncElasticsearch) -> AbstractDBManager:
+    """Менеджер БД для сервисов: ESDBManager с доверенными индексами и,
+    если включено, объединением запросов (BatchingDBManager).
+
+    """
+    db_manager = ESDBManager(
+        elastic,
+        trusted=settings.trusted_source.indices,
+        validate_rate=settings.trusted_source.validate_rate,
+    )
+    if settings.db_batch.enabled:
+        db_manager = BatchingDBManager(
+            db_manager,
+            window=settings.db_batch.window,
+            max_size=settings.db_batch.max_size,
+            search_window=settings.db_batch.search_window if settings.db_batch.search_enabled else None,
+            search_max_size=settings.db_batch.search_max_size,
+        )
+    return db_manager
 
 
 class NodeService:
@@ -55,20 +95,77 @@ class NodeService:
             Экземпляр pydantic BaseModel с данными из БД.
 
         """
-        @pydantic_cache(model=self.Node)
-        async def inner(*args, **kwargs):
-            return await self.db_manager.get(*args, **kwargs)
+        return await self._cached_get_by_id()(node_id)
+
+    async def get_by_ids(self, node_ids: list[UUID]) -> list[Optional[Node]]:
+        """Пакетный вариант get_by_id: закэшированные объекты читаются из
+        Redis одним запросом, отсутствующие в кэше - одним запросом к БД
+        (db_manager.get_many).
+
+        Args:
+          node_ids: список уникальных идентификаторов;
+
+        Returns:
+            Список экземпляров pydantic BaseModel (None для ненайденных) в
+            порядке node_ids.
+
+        """
+        async def fetch(calls: list[dict]) -> list[Optional[BaseModel]]:
+            nodes = await self.db_manager.get_many(
+                self.index, [call['node_id'] for call in calls], self.Node
+            )
+            for node in nodes:
+                if isinstance(node, DBManagerError):
+                    raise node
+            return nodes
+
+        return await self._cached_get_by_id().get_many(
+            [{'node_id': node_id} for node_id in node_ids], fetch
+        )
+
+    def _cached_get_by_id(self):
+        """Кэшируемая функция получения объекта по id. Общая для get_by_id и
+        get_by_ids, чтобы у них совпадали ключи кэша.
+
+        """
+        @pydantic_cache(model=self.Node, namespace=self.index, local_cache=True)
+        async def get_by_id(node_id: UUID):
+            return await self.db_manager.get(self.index, node_id, self.Node)
+
+        return get_by_id
 
-        return await inner(self.index, node_id, self.Node)
+    def _cached_count(self):
+        """Кэшируемый подсчет результатов. Ключ - индекс и условие отбора,
+        поэтому все страницы выдачи (в том числе по search_after) используют
+        одно значение. Своя политика времени жизни (пространство имен count,
+        без продления), значение снимается при изменении любой сущности
+        индекса (см. models.node.Total).
+
+        """
+        @pydantic_cache(model=Total, namespace='count', local_cache=True)
+        async def count(index: str, query: dict):
+            return Total(
+                count=await self.db_manager.count(index, query), id=self.Node.cache_tag
+            )
+
+        return count
 
     async def _get_from_elastic(
-            self, query: dict
+            self,
+            query: dict,
+            model: Optional[type[BaseModel]] = None,
+            total_hits: Optional[str] = None,
     ) -> tuple[list[Optional[Node]], int, list]:
         """Комплексный запрос в БД. Возвращает список объектов и значение
         search_after.
 
         Args:
           query: сформированное тело запроса;
+          model: модель объектов, по ней же выбираются загружаемые поля
+            (по умолчанию self.Node), для списков стоит передавать облегченную
+            модель;
+          total_hits: подсчет общего количества (off, capped или exact, см.
+            settings.total_hits), по умолчанию из настроек;
 
         Returns:
             Кортеж из трех значений:
@@ -78,8 +175,23 @@ class NodeService:
                 термин из Elastic, при желании можно реализовать и для SQL).
 
         """
+        total_hits = total_hits or settings.total_hits.mode
+        if total_hits == 'exact':
+            query = {**query, 'track_total_hits': True}
+        elif total_hits == 'capped':
+            query = {**query, 'track_total_hits': settings.total_hits.cap}
+        else:
+            # Страницы выдачи не считают совпадения, количество - отдельным
+            # запросом, закэшированным по условию отбора
+            query = {**query, 'track_total_hits': False}
+            (res, _, search_after), total = await asyncio.gather(
+                self.db_manager.search_all(self.index, model or self.Node, query),
+                self._cached_count()(self.index, query['query']),
+            )
+            return res, total.count, search_after
+
         res, total, search_after = await self.db_manager.search_all(
-            self.index, self.Node, query
+            self.index, model or self.Node, query
         )
 
         return res, total, search_after
@@ -6,13 +6,13 @@ from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 
 from cache.pydantic_cache import pydantic_cache
+from core.config import settings
 from db.elastic import get_elastic
 from db_managers.abstract_manager import AbstractDBManager
-from db_managers.es_manager import ESDBManager
 from elastic_requests.bool_query import BoolQuery, must_query_factory
-from models.film import Film, FilmsList
-from models.person import PersonDetails, PersonsList, Roles
-from services.node import NodeService
+from models.film import FilmStaff, FilmsList
+from models.person import Person, PersonDetails, PersonsList, Roles
+from services.node import NodeService, es_db_manager, next_page
 
 
 class PersonService(NodeService):
@@ -51,7 +51,7 @@ class PersonService(NodeService):
 
     async def _get_films(
             self, roles: list, person_id: UUID
-    ) -> list[Optional[Film]]:
+    ) -> list[Optional[FilmStaff]]:
         """Получаем список фильмов, связанных с указанной персоной. Так как
         искать приходиться сразу по нескольким категориям (у персоны могут быть
         разные роли), то используем BoolQuery с boolean_clause='should'.
@@ -66,13 +66,13 @@ class PersonService(NodeService):
         for role in roles:
             query.insert_nested_query(person_id, '{}s'.format(role), 'id')
         films, _, _ = await self.db_manager.search_all(
-            'movies', Film, query.body
+            'movies', FilmStaff, {**query.body, 'track_total_hits': False}
         )
         return films
 
     @staticmethod
     def _extract_roles(
-            films: [Optional[Film]], roles: list, person_id
+            films: [Optional[FilmStaff]], roles: list, person_id
     ) -> Roles:
         """Заполняем модель Roles, разбивая список фильмов по ролям персоны.
 
@@ -81,11 +81,13 @@ class PersonService(NodeService):
           roles: список интересующих ролей.
 
         """
+        # Документы доверенных индексов не валидируются, и id в них - строки
+        person_id = str(person_id)
         roles_data = {}
         for film in films:
             for role in roles:
                 staff = film.dict()['{}s'.format(role)]
-                if person_id in [man['id'] for man in staff]:
+                if person_id in [str(man['id']) for man in staff]:
                     roles_data.setdefault(role, set()).add(film.id)
         return Roles(**roles_data)
 
@@ -109,7 +111,12 @@ class PersonService(NodeService):
             results=movies
         )
 
-    @pydantic_cache(model=PersonsList)
+    @pydantic_cache(
+        model=PersonsList,
+        soft_expire=settings.cache_swr.soft_expire,
+        hard_expire=settings.cache_swr.hard_expire,
+        prefetch=next_page,
+    )
     async def get_persons(
             self,
             size: int = 50,
@@ -132,7 +139,7 @@ class PersonService(NodeService):
         )
 
         models, total, search_after = await self._get_from_elastic(
-            query=query_obj.body,
+            query=query_obj.body, model=Person
         )
 
         if not models:
@@ -144,7 +151,7 @@ class PersonService(NodeService):
             results=models
         )
 
-    @pydantic_cache(model=PersonsList)
+    @pydantic_cache(model=PersonsList, prefetch=next_page)
     async def search(
             self,
             search: str,
@@ -173,7 +180,7 @@ class PersonService(NodeService):
             page_number=page_number,
         )
         models, total, search_after = await self._get_from_elastic(
-            query_obj.body
+            query_obj.body, model=Person
         )
         if not models:
             return None
@@ -189,5 +196,4 @@ class PersonService(NodeService):
 def get_person_service(
     elastic: AsyncElasticsearch = Depends(get_elastic),
 ) -> PersonService:
-    es_db_manager = ESDBManager(elastic)
-    return PersonService(es_db_manager)
+    return PersonService(es_db_manager(elastic))
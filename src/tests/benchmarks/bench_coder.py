@@ -0,0 +1,74 @@
+"""Сравнение JsonCoder и BinaryCoder на реальных FilmsList из тестовых данных.
+
+Для JsonCoder учитываем и декодирование UTF-8, которое выполнял Redis клиент
+с decode_responses=True. Запуск из каталога src:
+
+    python -m tests.benchmarks.bench_coder
+
+"""
+import timeit
+from pathlib import Path
+
+import orjson
+
+from cache.coder import BinaryCoder, JsonCoder
+from models.film import FilmsList
+
+TESTDATA = Path(__file__).parent.parent / 'functional' / 'testdata'
+NUMBER = 20
+
+
+def load_movies() -> list[dict]:
+    with open(TESTDATA / 'movies.json', 'rb') as file:
+        movies = [orjson.loads(line) for line in file]
+    for movie in movies:
+        # В тестовых данных нет длительности фильма
+        movie.setdefault('length', 0)
+    return movies
+
+
+def measure(func) -> float:
+    """Среднее время вызова в микросекундах."""
+    return min(timeit.repeat(func, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+def main():
+    movies = load_movies()
+    payloads = {
+        'page 10': FilmsList(count=len(movies), next='x', results=movies[:10]),
+        'page 100': FilmsList(count=len(movies), next='x', results=movies[:100]),
+        f'all {len(movies)}': FilmsList(count=len(movies), results=movies),
+    }
+    coders = {
+        'json': JsonCoder,
+        'binary': type('RawCoder', (BinaryCoder,), {'compression': 'none'}),
+        'binary+lz4': type('Lz4Coder', (BinaryCoder,), {'compression': 'lz4'}),
+        'binary+zstd': type('ZstdCoder', (BinaryCoder,), {'compression': 'zstd'}),
+    }
+
+    print('| payload | coder | size, bytes | encode, us | decode, us | decode+parse, us |')
+    print('|---|---|---|---|---|---|')
+    for name, value in payloads.items():
+        for coder_name, coder in coders.items():
+            encoded = coder.encode(value)
+            if isinstance(encoded, str):
+                encoded = encoded.encode()
+
+                def decode():
+                    return coder.decode(encoded.decode())
+            else:
+                def decode():
+                    return coder.decode(encoded)
+
+            print('| {} | {} | {} | {:.0f} | {:.0f} | {:.0f} |'.format(
+                name,
+                coder_name,
+                len(encoded),
+                measure(lambda: coder.encode(value)),
+                measure(decode),
+                measure(lambda: FilmsList.parse_obj(decode())),
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Сборка моделей из документов Elastic: валидация (parse_obj) против сборки
+без валидации для доверенных индексов (db_managers.construct), на фильмах из
+тестовых данных. Запуск из каталога src:
+
+    python -m tests.benchmarks.bench_construct
+
+"""
+import timeit
+from pathlib import Path
+
+import orjson
+
+from db_managers.construct import construct
+from models.film import Film, FilmShort, FilmStaff
+
+TESTDATA = Path(__file__).parent.parent / 'functional' / 'testdata'
+NUMBER = 5
+
+
+def load_movies() -> list[dict]:
+    with open(TESTDATA / 'movies.json', 'rb') as file:
+        movies = [orjson.loads(line) for line in file]
+    for movie in movies:
+        # В тестовых данных нет длительности фильма
+        movie.setdefault('length', 0)
+    return movies
+
+
+def measure(func) -> float:
+    """Среднее время вызова в микросекундах."""
+    return min(timeit.repeat(func, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+def main():
+    movies = load_movies()
+    # Фильмография на 10000 фильмов - повторяем тестовые данные
+    filmography = (movies * (10000 // len(movies) + 1))[:10000]
+    cases = {
+        'Film x 100': (Film, movies[:100]),
+        'FilmShort x 100': (FilmShort, movies[:100]),
+        'FilmStaff x 10000': (FilmStaff, filmography),
+    }
+
+    print('| case | parse_obj, us | construct, us | speedup |')
+    print('|---|---|---|---|')
+    for name, (model, docs) in cases.items():
+        validated = measure(lambda: [model.parse_obj(doc) for doc in docs])
+        constructed = measure(lambda: [construct(model, doc) for doc in docs])
+        print('| {} | {:.0f} | {:.0f} | {:.1f}x |'.format(name, validated, constructed, validated / constructed))
+
+
+if __name__ == '__main__':
+    main()
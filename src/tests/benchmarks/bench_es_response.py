@@ -0,0 +1,102 @@
+"""Размер и время разбора ответов Elastic на фильмах из тестовых данных:
+стандартный json против orjson (db.elastic.OrjsonSerializer), полный ответ
+против ответа с filter_path и _source по модели списка (ESDBManager).
+
+Ответы собираются в том виде, в каком их отдает _search индекса movies,
+поэтому Elastic для запуска не нужен. Запуск из каталога src:
+
+    python -m tests.benchmarks.bench_es_response
+
+"""
+import json
+import timeit
+from pathlib import Path
+
+import orjson
+
+from db_managers.es_manager import ESDBManager, source_fields
+from models.film import Film, FilmShort
+
+TESTDATA = Path(__file__).parent.parent / 'functional' / 'testdata'
+NUMBER = 20
+
+
+def load_movies() -> list[dict]:
+    with open(TESTDATA / 'movies.json', 'rb') as file:
+        movies = [orjson.loads(line) for line in file]
+    for movie in movies:
+        # В тестовых данных нет длительности фильма
+        movie.setdefault('length', 0)
+    return movies
+
+
+def full_response(movies: list[dict]) -> dict:
+    """Ответ _search без фильтрации, как его отдает Elastic."""
+    return {
+        'took': 3,
+        'timed_out': False,
+        '_shards': {'total': 1, 'successful': 1, 'skipped': 0, 'failed': 0},
+        'hits': {
+            'total': {'value': len(movies), 'relation': 'eq'},
+            'max_score': None,
+            'hits': [
+                {
+                    '_index': 'movies',
+                    '_type': '_doc',
+                    '_id': movie['id'],
+                    '_score': None,
+                    '_source': movie,
+                    'sort': [movie['title'], movie['id']],
+                }
+                for movie in movies
+            ],
+        },
+    }
+
+
+def filtered_response(movies: list[dict], fields: set[str]) -> dict:
+    """Ответ с filter_path ESDBManager и _source по полям модели списка."""
+    return {
+        'hits': {
+            'total': {'value': len(movies)},
+            'hits': [
+                {
+                    '_source': {name: value for name, value in movie.items() if name in fields},
+                    'sort': [movie['title'], movie['id']],
+                }
+                for movie in movies
+            ],
+        },
+    }
+
+
+def measure(func) -> float:
+    """Среднее время вызова в микросекундах."""
+    return min(timeit.repeat(func, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+def main():
+    movies = load_movies()
+    db_manager = ESDBManager(elastic=None)
+    top_fields = {field.split('.')[0] for field in source_fields(FilmShort)}
+    responses = {}
+    for size in (10, 100):
+        page = movies[:size]
+        responses[f'page {size}, full'] = (full_response(page), Film)
+        responses[f'page {size}, filtered'] = (filtered_response(page, top_fields), FilmShort)
+
+    print('| response | size, bytes | json, us | orjson, us | orjson+parse, us |')
+    print('|---|---|---|---|---|')
+    for name, (response, model) in responses.items():
+        raw = json.dumps(response, ensure_ascii=False, separators=(',', ':')).encode()
+        print('| {} | {} | {:.0f} | {:.0f} | {:.0f} |'.format(
+            name,
+            len(raw),
+            measure(lambda: json.loads(raw)),
+            measure(lambda: orjson.loads(raw)),
+            measure(lambda: db_manager._parse_hits(orjson.loads(raw), 'movies', model)),
+        ))
+
+
+if __name__ == '__main__':
+    main()
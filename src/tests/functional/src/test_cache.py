@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from http import HTTPStatus
+
+import orjson
+
+
+pytestmark = pytest.mark.asyncio
+
+# Ответ для анонимного пользователя (cache.response_cache.response_key)
+GENRES_RESPONSE_KEY = 'response:/api/v1/genres?:Anonymous'
+
+
+async def test_cached_response(redis_client, make_get_request, es_write_data_genres):
+    """
+    План тестирования:
+    - удаляем готовый ответ и запрашиваем API, убеждаемся что ответ попал в кэш
+    - подменяем тело ответа в кэше, убеждаемся что API отдает его без
+      обращения к обработчику
+    """
+    await redis_client.delete(GENRES_RESPONSE_KEY)
+    response = await make_get_request('/api/v1/genres')
+    assert response.status == HTTPStatus.OK
+
+    cached = await redis_client.get(GENRES_RESPONSE_KEY)
+    assert cached
+
+    meta, _, body = cached.partition(b'\n')
+    body = orjson.loads(body)
+    body['count'] = 99999999999
+    await redis_client.set(GENRES_RESPONSE_KEY, meta + b'\n' + orjson.dumps(body))
+
+    response = await make_get_request('/api/v1/genres')
+    await redis_client.delete(GENRES_RESPONSE_KEY)
+
+    assert response.status == HTTPStatus.OK
+    assert response.body['count'] == 99999999999
+    assert response.headers['content-type'] == 'application/json'
+
+
+async def test_tag_invalidation(redis_client, make_get_request, es_write_data_movies):
+    """
+    План тестирования:
+    - запрашиваем фильм и список фильмов, убеждаемся что они попали в кэш
+    - публикуем id фильма в stream инвалидации
+    - убеждаемся что воркер удалил из кэша фильм, список, количество
+      результатов и собранные из них ответы
+    """
+    film_id = 'e79b49dc-a5d9-46ec-a2c6-4cead985d732'
+    detail_key = f'cache:movies:services.node:get_by_id:{{"node_id":"{film_id}"}}'
+    list_key = 'cache::services.film:get_films:{"page_number":1,"size":10}'
+    # Количество кэшируется только в режиме total_hits=off, имитируем его
+    count_key = 'cache:count:services.node:count:test'
+
+    await make_get_request(f'/api/v1/films/{film_id}')
+    await make_get_request('/api/v1/films')
+    await redis_client.set(count_key, b'0')
+    await redis_client.sadd('tag:count:film', count_key)
+
+    responses = set()
+    for key in (detail_key, list_key):
+        responses |= await redis_client.smembers(f'dep:{key}')
+    assert responses
+    keys = [detail_key, list_key, count_key, *responses]
+    assert await redis_client.exists(*keys) == len(keys)
+
+    await redis_client.xadd('cache:invalidate', {'tags': f'film:{film_id}'})
+
+    for _ in range(50):
+        if not await redis_client.exists(*keys):
+            break
+        await asyncio.sleep(0.1)
+
+    assert await redis_client.exists(*keys) == 0
+
+
+async def test_stale_if_error(redis_client, make_get_request, es_client, es_write_data_movies):
+    """
+    План тестирования:
+    - запрашиваем фильм, рядом с записью в кэше появляется теневая копия
+    - удаляем запись и собранные из нее ответы, закрываем индекс
+    - убеждаемся что API отдает теневую копию с заголовком X-Cache-Status
+    """
+    film_id = 'e79b49dc-a5d9-46ec-a2c6-4cead985d732'
+    cache_key = f'cache:movies:services.node:get_by_id:{{"node_id":"{film_id}"}}'
+
+    response = await make_get_request(f'/api/v1/films/{film_id}')
+    assert response.status == HTTPStatus.OK
+    assert await redis_client.exists(f'{cache_key}:stale')
+
+    responses = await redis_client.smembers(f'dep:{cache_key}')
+    await redis_client.delete(cache_key, *responses)
+
+    await es_client.indices.close(index='movies')
+    try:
+        stale_response = await make_get_request(f'/api/v1/films/{film_id}')
+    finally:
+        await es_client.indices.open(index='movies', wait_for_active_shards='all')
+
+    assert stale_response.status == HTTPStatus.OK
+    assert stale_response.headers['x-cache-status'] == 'stale'
+    assert stale_response.body == response.body
@@ -97,3 +97,19 @@ async def test_films_search(make_get_request, es_write_data_movies, params, answ
     assert len(response.body['results']) == answer['results']
     if 'id' in answer:
         assert response.body['results'][0]['id'] == answer['id']
+
+
+async def test_films_by_ids(make_get_request, es_write_data_movies):
+    ids = 'cadefb3c-948c-4363-9f34-864cbc6d00d0,cadefb3c-948c-4363-9f34-864cbc6d00d4'
+    response = await make_get_request(url=f'/api/v1/films', params={'ids': ids})
+
+    assert response.status == HTTPStatus.OK
+    assert response.body['found'] == 1
+    assert [item['found'] for item in response.body['results']] == [False, True]
+    assert response.body['results'][0]['film'] is None
+    assert response.body['results'][1]['film']['title'] == 'Saving Star Wars'
+
+
+async def test_films_by_ids_not_valid(make_get_request, es_write_data_movies):
+    response = await make_get_request(url=f'/api/v1/films', params={'ids': '000'})
+    assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -1,64 +1,74 @@
-import json
 import pytest
 
+from cache.coder import BinaryCoder
+
 
 pytestmark = pytest.mark.asyncio
 
 
+async def delete_with_responses(redis_client, cache_key: str):
+    """Удаление ключа вместе с собранными из него ответами (response cache),
+    как при инвалидации.
+
+    """
+    responses = await redis_client.smembers(f'dep:{cache_key}')
+    await redis_client.delete(cache_key, *responses)
+
+
 @pytest.mark.parametrize(
     'url, cache_key, inject_field, inject_value',
     [
         (
             '/api/v1/films/search?query=lucas',
-            "cache::services.film:search:(FilmService,):{'search': 'lucas', 'search_after': None, 'page_number': 1, 'size': 10}",
+            'cache::services.film:search:{"page_number":1,"search":"lucas","size":10}',
             'count',
             99999999999
         ),
         (
             '/api/v1/films/e79b49dc-a5d9-46ec-a2c6-4cead985d732',
-            "cache::services.node:inner:('movies', UUID('e79b49dc-a5d9-46ec-a2c6-4cead985d732'), <class 'models.film.Film'>):{}",
+            'cache:movies:services.node:get_by_id:{"node_id":"e79b49dc-a5d9-46ec-a2c6-4cead985d732"}',
             'title',
             'FROM_CACHE'
         ),
         (
             '/api/v1/films',
-            "cache::services.film:get_films:(FilmService,):{'sort': None, 'search_after': None, 'filter_genre': None, 'size': 10, 'page_number': 1}",
+            'cache::services.film:get_films:{"page_number":1,"size":10}',
             'count',
             99999999999
         ),
         (
             '/api/v1/persons/search?query=lucas',
-            "cache::services.person:search:(PersonService,):{'search': 'lucas', 'size': 10, 'search_after': None, 'sort': 'name.raw'}",
+            'cache::services.person:search:{"page_number":1,"search":"lucas","size":10,"sort":"name.raw"}',
             'count',
             99999999999
         ),
         (
             '/api/v1/persons/a5a8f573-3cee-4ccc-8a2b-91cb9f55250a/film',
-            "cache::services.person:get_movies_with_person:(PersonService, UUID('a5a8f573-3cee-4ccc-8a2b-91cb9f55250a')):{}",
+            'cache::services.person:get_movies_with_person:{"person_id":"a5a8f573-3cee-4ccc-8a2b-91cb9f55250a"}',
             'count',
             99999999999
         ),
         (
             '/api/v1/persons/a5a8f573-3cee-4ccc-8a2b-91cb9f55250a',
-            "cache::services.node:inner:('persons', UUID('a5a8f573-3cee-4ccc-8a2b-91cb9f55250a'), <class 'models.person.PersonDetails'>):{}",
+            'cache:persons:services.node:get_by_id:{"node_id":"a5a8f573-3cee-4ccc-8a2b-91cb9f55250a"}',
             'name',
             'FROM_CACHE'
         ),
         (
             '/api/v1/persons',
-            "cache::services.person:get_persons:(PersonService,):{'size': 50, 'page_number': 1, 'search_after': None}",
+            'cache::services.person:get_persons:{"page_number":1,"size":50}',
             'count',
             99999999999
         ),
         (
             '/api/v1/genres/3d8d9bf5-0d90-4353-88ba-4ccc5d2c07ff',
-            "cache::services.node:inner:('genres', UUID('3d8d9bf5-0d90-4353-88ba-4ccc5d2c07ff'), <class 'models.genre.Genre'>):{}",
+            'cache:genres:services.node:get_by_id:{"node_id":"3d8d9bf5-0d90-4353-88ba-4ccc5d2c07ff"}',
             'name',
             'FROM_CACHE'
         ),
         (
             '/api/v1/genres',
-            "cache::services.genre:get_genres:(GenreService,):{'size': 10, 'page_number': 1}",
+            'cache::services.genre:get_genres:{"page_number":1,"size":10}',
             'count',
             99999999999
         ),
@@ -70,18 +80,20 @@ async def test_redis(redis_client, make_get_request, es_write_data_all, url, cac
     - удаляем кэш по ключу и запрашиваем API, убеждаемся что данные попадают в кэш
     - делаем инъекцию в кэш и запрашиваем данные через API, убеждаемся что данные отдаются из кэша
     """
-    await redis_client.delete(cache_key)
+    await delete_with_responses(redis_client, cache_key)
     await make_get_request(url)
 
     cache_data = await redis_client.get(cache_key)
 
     assert cache_data
 
-    cache_data = json.loads(cache_data)
+    cache_data = BinaryCoder.decode(cache_data)
     cache_data[inject_field] = inject_value
-    await redis_client.set(cache_key, json.dumps(cache_data))
+    # Готовый ответ собран из прежнего значения
+    await delete_with_responses(redis_client, cache_key)
+    await redis_client.set(cache_key, BinaryCoder.encode(cache_data))
 
     response = await make_get_request(url)
-    await redis_client.delete(cache_key)
+    await delete_with_responses(redis_client, cache_key)
 
     assert response.body[inject_field] == inject_value
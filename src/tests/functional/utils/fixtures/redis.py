@@ -8,8 +8,6 @@ from tests.functional.settings import test_settings
 async def redis_client():
     client = await aioredis.from_url(
         f"redis://{test_settings.redis_host}:{test_settings.redis_port}",
-        encoding="utf8",
-        decode_responses=True
     )
     yield client
     await client.close()
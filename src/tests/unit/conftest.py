@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeServer, aioredis
+from fastapi_cache import FastAPICache
+
+from cache.backend import RedisBatchBackend
+from cache.coder import BinaryCoder
+from cache.key_builder import key_builder
+
+
+@pytest.fixture(scope='session')
+def event_loop():
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def redis():
+    # Свой сервер на каждый тест: данные тестов не пересекаются
+    return aioredis.FakeRedis(server=FakeServer())
+
+
+@pytest.fixture(autouse=True)
+def init_cache(redis):
+    """Кэш поверх fakeredis вместо Redis, заново для каждого теста."""
+    # init() без reset() не меняет уже настроенный backend
+    FastAPICache.reset()
+    FastAPICache.init(
+        RedisBatchBackend(redis), prefix='cache', coder=BinaryCoder, expire=60, key_builder=key_builder
+    )
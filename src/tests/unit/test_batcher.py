@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from db_managers.abstract_manager import DBManagerError
+from db_managers.batcher import BatchLoader
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeStorage:
+    def __init__(self, data: dict, error: Exception | None = None):
+        self.data = data
+        self.error = error
+        self.batches = []
+
+    async def load_many(self, keys: list) -> list:
+        self.batches.append(keys)
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+        return [self.data.get(key) for key in keys]
+
+
+async def test_same_tick_calls_are_batched_in_order():
+    storage = FakeStorage({'a': 1, 'b': 2, 'c': 3})
+    loader = BatchLoader(storage.load_many)
+
+    results = await asyncio.gather(*(loader.load(key) for key in 'cab'))
+
+    assert results == [3, 1, 2]
+    assert storage.batches == [['c', 'a', 'b']]
+
+
+async def test_not_found_and_duplicates():
+    storage = FakeStorage({'a': 1})
+    loader = BatchLoader(storage.load_many)
+
+    results = await asyncio.gather(loader.load('a'), loader.load('x'), loader.load('a'))
+
+    assert results == [1, None, 1]
+    assert storage.batches == [['a', 'x']]
+
+
+async def test_error_is_raised_for_every_caller():
+    storage = FakeStorage({}, error=DBManagerError('es down'))
+    loader = BatchLoader(storage.load_many)
+
+    results = await asyncio.gather(loader.load('a'), loader.load('b'), return_exceptions=True)
+
+    assert all(isinstance(result, DBManagerError) for result in results)
+    # Следующий пакет загружается заново
+    storage.error = None
+    assert await loader.load('a') is None
+    assert len(storage.batches) == 2
+
+
+async def test_wrong_number_of_values():
+    async def load_many(keys):
+        return keys[:-1]
+
+    loader = BatchLoader(load_many)
+
+    with pytest.raises(ValueError):
+        await asyncio.gather(loader.load('a'), loader.load('b'))
+
+
+async def test_max_size_and_window():
+    storage = FakeStorage({key: key for key in range(5)})
+    loader = BatchLoader(storage.load_many, window=0.01, max_size=2)
+
+    async def load_later(key):
+        await asyncio.sleep(0.005)
+        return await loader.load(key)
+
+    results = await asyncio.gather(*(loader.load(key) for key in range(3)), load_later(3))
+
+    assert results == [0, 1, 2, 3]
+    assert storage.batches == [[0, 1], [2, 3]]
+
+
+async def test_error_value_is_raised_for_its_caller_only():
+    async def load_many(keys):
+        return [DBManagerError(key) if key == 'bad' else key.upper() for key in keys]
+
+    loader = BatchLoader(load_many)
+
+    results = await asyncio.gather(loader.load('a'), loader.load('bad'), return_exceptions=True)
+
+    assert results[0] == 'A'
+    assert isinstance(results[1], DBManagerError)
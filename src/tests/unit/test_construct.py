@@ -0,0 +1,41 @@
+from uuid import UUID
+
+from db_managers.construct import construct
+from models.film import Film, FilmShort
+from models.person import PersonDetails
+
+FILM = {
+    'id': 'cadefb3c-948c-4363-9f34-864cbc6d00d4',
+    'title': 'Saving Star Wars',
+    'imdb_rating': 6.7,
+    'length': 90,
+    'description': '',
+    'genre': [{'id': '120a21cf-9097-479e-904a-13dd7198c1dd', 'name': 'Adventure'}],
+    'actors': [{'id': '5c360057-c51f-4376-bdf5-049b87fa853b', 'name': 'Bradley Cooper'}],
+    'writers': [],
+    'directors': [],
+    'director': ['not a model field'],
+}
+
+
+def test_nested_models_are_constructed():
+    film = construct(Film, FILM)
+
+    assert isinstance(film, Film)
+    assert film.genre[0].name == 'Adventure'
+    assert type(film.actors[0]).__name__ == 'Person'
+    # Значения не приводятся к типам полей
+    assert film.actors[0].id == '5c360057-c51f-4376-bdf5-049b87fa853b'
+
+
+def test_matches_validation_after_parse():
+    assert Film.parse_obj(construct(Film, FILM).dict()) == Film.parse_obj(FILM)
+
+
+def test_extra_fields_dropped_and_defaults_set():
+    film = construct(FilmShort, FILM)
+    assert set(film.dict()) == {'id', 'title', 'imdb_rating', 'length'}
+
+    person = construct(PersonDetails, {'id': '5c360057-c51f-4376-bdf5-049b87fa853b', 'name': 'Bradley Cooper'})
+    assert person.roles.actor == []
+    assert UUID(person.id) == UUID('5c360057-c51f-4376-bdf5-049b87fa853b')
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+
+from cache.health import CLOSED, HALF_OPEN, OPEN, CacheHealth
+from core.config import settings
+
+
+@pytest.fixture
+def config():
+    saved = settings.cache_health.copy()
+    config = settings.cache_health
+    config.enabled = True
+    config.window = 10
+    config.min_samples = 4
+    config.error_ratio = 0.5
+    config.latency_threshold = 0.05
+    config.cooldown = 60.0
+    yield config
+    settings.cache_health = saved
+
+
+def test_errors_open_the_breaker(config):
+    health = CacheHealth()
+    for _ in range(3):
+        health.record(0.001, error=True)
+    assert health.state == CLOSED
+
+    health.record(0.001, error=True)
+
+    assert health.state == OPEN
+    assert health.bypassed
+    assert not health.available()
+
+
+def test_slow_reads_open_the_breaker(config):
+    health = CacheHealth()
+    for _ in range(4):
+        health.record(0.1)
+
+    assert health.state == OPEN
+
+
+def test_slow_writes_do_not_open_the_breaker(config):
+    health = CacheHealth()
+    for _ in range(20):
+        health.record(None)
+    for _ in range(4):
+        health.record(0.001)
+
+    assert health.state == CLOSED
+
+
+def test_half_open_probe_closes_on_success(config):
+    health = CacheHealth()
+    health.trip()
+    health.open_until = time.monotonic()
+
+    assert health.available()
+    assert health.state == HALF_OPEN
+    # Пока идет пробное обращение, остальные обходят кэш
+    assert not health.available()
+
+    health.record(0.001)
+
+    assert health.state == CLOSED
+    assert health.available()
+
+
+def test_half_open_probe_reopens_on_error(config):
+    health = CacheHealth()
+    health.trip()
+    health.open_until = time.monotonic()
+    assert health.available()
+
+    health.record(0.001, error=True)
+
+    assert health.state == OPEN
+    assert not health.available()
+
+
+@pytest.mark.asyncio
+async def test_call_records_timeouts(config):
+    health = CacheHealth()
+    for _ in range(4):
+        with pytest.raises(asyncio.TimeoutError):
+            await health.call(asyncio.sleep(1), timeout=0.001, timed=False)
+
+    assert health.state == OPEN
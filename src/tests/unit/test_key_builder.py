@@ -0,0 +1,88 @@
+from uuid import UUID
+
+import pytest
+
+from api.v1.schemes import FilmsSorting
+from cache.key_builder import bind_arguments, canonical, key_builder, normalize_params
+from core.config import settings
+from models.film import Film
+
+
+class Service:
+    async def search(self, search: str, sort: str = '', search_after: list | None = None,
+                     size: int = 10, page_number: int = 1):
+        pass
+
+
+async def build_key(*args, **kwargs) -> str:
+    bound = bind_arguments(Service.search, (Service(),) + args, kwargs)
+    normalize_params(bound.arguments)
+    return await key_builder(Service.search, 'films', args=bound.args, kwargs=bound.kwargs)
+
+
+@pytest.mark.parametrize(
+    'value, expected',
+    [
+        ('', None),
+        ('  name.raw ', 'name.raw'),
+        (UUID('3d8d9bf5-0d90-4353-88ba-4ccc5d2c07ff'), '3d8d9bf5-0d90-4353-88ba-4ccc5d2c07ff'),
+        (FilmsSorting.desc, '-imdb_rating'),
+        (Film, 'models.film.Film'),
+        ((1, 'a', None), [1, 'a', None]),
+    ]
+)
+def test_canonical(value, expected):
+    assert canonical(value) == expected
+
+
+@pytest.mark.parametrize(
+    'params, expected',
+    [
+        ({'search': ' George   LUCAS '}, {'search': 'george lucas'}),
+        ({'search': 'Lucas OR Star'}, {'search': 'lucas OR star'}),
+        ({'search': 'title:Star  NOT Wars'}, {'search': 'title:Star NOT wars'}),
+        ({'search_after': [7.5, 'x'], 'page_number': 5}, {'search_after': [7.5, 'x'], 'page_number': 1}),
+        ({'search_after': None, 'page_number': 5}, {'search_after': None, 'page_number': 5}),
+    ]
+)
+def test_normalize_params(params, expected):
+    assert normalize_params(params) == expected
+
+
+@pytest.mark.asyncio
+async def test_key_readable():
+    key = await build_key('lucas')
+    assert key == f'cache:films:{__name__}:search:' \
+                  '{"page_number":1,"search":"lucas","size":10}'
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'args, kwargs',
+    [
+        (('lucas',), {}),
+        ((' Lucas ',), {'sort': None}),
+        ((), {'search': 'LUCAS', 'sort': '', 'size': 10}),
+        (('lucas', '', None, 10, 1), {}),
+    ]
+)
+async def test_key_equivalent(args, kwargs):
+    assert await build_key(*args, **kwargs) == await build_key('lucas')
+
+
+@pytest.mark.asyncio
+async def test_key_search_after_ignores_page():
+    assert await build_key('lucas', search_after=[7.5, 'x'], page_number=3) == \
+           await build_key('lucas', search_after=[7.5, 'x'])
+    assert await build_key('lucas', page_number=3) != await build_key('lucas')
+
+
+@pytest.mark.asyncio
+async def test_key_hashed():
+    key = await build_key('lucas ' * 50)
+    prefix, payload = key.rsplit(':', 1)
+
+    assert prefix == f'cache:films:{__name__}:search'
+    assert len(payload) == 32
+    assert len(key) < settings.cache_key_max_length
+    assert key == await build_key(' '.join(['Lucas'] * 50))
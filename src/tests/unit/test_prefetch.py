@@ -0,0 +1,101 @@
+import asyncio
+from typing import Optional
+
+import pytest
+
+from cache import stale
+from cache.hot_calls import hot_calls
+from cache.prefetch import prefetcher
+from cache.pydantic_cache import pydantic_cache
+from core.config import settings
+from models.node import Node
+
+pytestmark = pytest.mark.asyncio
+
+
+class Page(Node):
+    page: int
+
+
+def next_page(params: dict, value: Page) -> Optional[dict]:
+    return {'page': params['page'] + 1} if value.page < 3 else None
+
+
+@pytest.fixture
+def config():
+    saved = settings.prefetch.copy()
+    config = settings.prefetch
+    config.enabled = True
+    config.burst = 10
+    prefetcher.tokens = config.burst
+    yield config
+    settings.prefetch = saved
+
+
+async def drain():
+    while prefetcher.tasks:
+        await asyncio.gather(*prefetcher.tasks)
+
+
+async def test_next_page_is_prefetched(redis, config):
+    calls = []
+
+    @pydantic_cache(model=Page, namespace='prefetch', prefetch=next_page)
+    async def get_page(page: int):
+        calls.append(page)
+        return Page(page=page)
+
+    await get_page(1)
+    await drain()
+
+    # Упреждающий вызов сам не запускает следующий
+    assert calls == [1, 2]
+    assert len(await redis.keys('cache:prefetch:*')) == 2
+
+    await get_page(2)
+    await drain()
+
+    assert calls == [1, 2, 3]
+
+
+async def test_prefetch_does_not_mark_request_stale(redis, config):
+    @pydantic_cache(model=Page, namespace='prefetch', prefetch=next_page)
+    async def get_page(page: int):
+        if page > 1:
+            stale.mark_stale()
+        return Page(page=page)
+
+    mark = stale.begin()
+    await get_page(1)
+    await drain()
+
+    assert not mark.stale
+
+
+async def test_prefetch_is_not_counted_as_hot(redis, config):
+    hot_calls.sketches['keys'].clear()
+
+    @pydantic_cache(model=Page, namespace='prefetch-hot', prefetch=next_page)
+    async def get_page(page: int):
+        return Page(page=page)
+
+    await get_page(1)
+    await drain()
+
+    assert [key for key, *_ in hot_calls.sketches['keys'].top(10)] == [
+        'cache:prefetch-hot:test_prefetch:get_page:{"page":1}'
+    ]
+
+
+async def test_prefetch_is_disabled_by_default(redis):
+    calls = []
+
+    @pydantic_cache(model=Page, namespace='prefetch', prefetch=next_page)
+    async def get_page(page: int):
+        calls.append(page)
+        return Page(page=page)
+
+    await get_page(1)
+    await drain()
+
+    assert calls == [1]
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from cache import stale
+from cache.pydantic_cache import pydantic_cache
+from cache.single_flight import single_flight
+from core.config import settings
+from db_managers.abstract_manager import DBManagerError
+from models.node import Node
+
+pytestmark = pytest.mark.asyncio
+
+
+class Item(Node):
+    id: int
+    version: int
+
+
+class Source:
+    """Источник данных, каждый вызов возвращает новую версию."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def get(self, item_id: int) -> Item:
+        self.calls += 1
+        return Item(id=item_id, version=self.calls)
+
+
+async def only_key(redis) -> str:
+    keys = await redis.keys('cache:*')
+    assert len(keys) == 1
+    return keys[0]
+
+
+async def test_stale_value_is_served_and_refreshed_in_background(redis):
+    source = Source()
+
+    @pydantic_cache(model=Item, namespace='swr', soft_expire=10, hard_expire=100)
+    async def get_item(item_id: int):
+        return await source.get(item_id)
+
+    assert (await get_item(1)).version == 1
+    key = await only_key(redis)
+
+    # Свежая запись (TTL больше hard_expire - soft_expire) не обновляется
+    assert (await get_item(1)).version == 1
+    assert source.calls == 1
+
+    # Возраст записи вычисляется по TTL: запись старше soft_expire
+    await redis.expire(key, 50)
+    assert (await get_item(1)).version == 1
+    await asyncio.gather(*single_flight._calls.values())
+
+    assert source.calls == 2
+    assert await redis.ttl(key) > 90
+    assert (await get_item(1)).version == 2
+
+
+@pytest.fixture
+def stale_if_error():
+    saved = settings.stale_if_error.copy()
+    settings.stale_if_error.enabled = True
+    yield settings.stale_if_error
+    settings.stale_if_error = saved
+
+
+async def test_shadow_copy_is_served_on_db_error(redis, stale_if_error):
+    source = Source()
+    failing = False
+
+    @pydantic_cache(model=Item, namespace='sie')
+    async def get_item(item_id: int):
+        if failing:
+            raise DBManagerError('unavailable')
+        return await source.get(item_id)
+
+    await get_item(1)
+    key = next(key for key in await redis.keys('cache:*') if not key.endswith(b':stale'))
+    await redis.delete(key)
+    failing = True
+
+    mark = stale.begin()
+    assert (await get_item(1)).version == 1
+    assert mark.stale
+
+
+async def test_db_error_without_shadow_copy_is_raised(redis, stale_if_error):
+    @pydantic_cache(model=Item, namespace='sie')
+    async def get_item(item_id: int):
+        raise DBManagerError('unavailable')
+
+    mark = stale.begin()
+    with pytest.raises(DBManagerError):
+        await get_item(1)
+    assert not mark.stale
@@ -0,0 +1,16 @@
+from starlette.responses import Response
+
+from cache.response_cache import decode_response, encode_response
+
+
+def test_repeated_headers_survive_round_trip():
+    response = Response(content=b'{"a":1}', media_type='application/json')
+    response.raw_headers.append((b'vary', b'Accept-Encoding'))
+    response.raw_headers.append((b'vary', b'Authorization'))
+
+    decoded = decode_response(encode_response(response))
+
+    assert decoded.status_code == 200
+    assert decoded.body == b'{"a":1}'
+    assert sorted(decoded.raw_headers) == sorted(response.raw_headers)
+    assert decoded.headers.getlist('vary') == ['Accept-Encoding', 'Authorization']
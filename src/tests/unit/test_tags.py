@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from cache import tags
+from core.config import settings
+
+pytestmark = pytest.mark.asyncio
+
+FILM = 'film:e79b49dc-a5d9-46ec-a2c6-4cead985d732'
+DETAIL_KEY = 'cache:movies:services.node:get_by_id:{"node_id":"e79b49dc-a5d9-46ec-a2c6-4cead985d732"}'
+LIST_KEY = 'cache::services.film:get_films:{"page_number":1,"size":10}'
+COUNT_KEY = 'cache::services.film:count:{}'
+RESPONSE_KEY = 'response:/api/v1/films?:Anonymous'
+
+
+@pytest.fixture
+def block():
+    saved = settings.cache_tags.block
+    settings.cache_tags.block = 10
+    yield
+    settings.cache_tags.block = saved
+
+
+async def fill(redis):
+    await tags.set_many_with_tags(redis, [
+        (DETAIL_KEY, b'detail', 60, [FILM]),
+        (LIST_KEY, b'list', 60, [FILM]),
+        (COUNT_KEY, b'count', 60, ['count:film']),
+    ])
+    await tags.set_with_dependencies(redis, RESPONSE_KEY, b'response', 60, [LIST_KEY])
+
+
+async def wait_deleted(redis, *keys):
+    for _ in range(100):
+        if not await redis.exists(*keys):
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+async def stop(task: asyncio.Task):
+    # fakeredis изредка теряет отмену, пришедшую во время блокирующего
+    # XREAD, и consume продолжает чтение: отменяем до завершения задачи
+    while not task.done():
+        task.cancel()
+        await asyncio.wait([task], timeout=0.1)
+
+
+async def test_invalidate_deletes_tagged_count_and_dependent_keys(redis):
+    await fill(redis)
+    await redis.set('cache::other', b'other')
+
+    deleted = await tags.invalidate(redis, [FILM])
+
+    assert deleted == 4
+    assert not await redis.exists(DETAIL_KEY, LIST_KEY, COUNT_KEY, RESPONSE_KEY)
+    assert await redis.exists('cache::other')
+
+
+async def test_consume_processes_new_messages_only(redis, block):
+    await fill(redis)
+    # Опубликовано до запуска воркера - уже обработано другими
+    await tags.publish(redis, [FILM])
+
+    task = asyncio.create_task(tags.consume(redis))
+    try:
+        await asyncio.sleep(0.05)
+        assert await redis.exists(DETAIL_KEY, LIST_KEY, COUNT_KEY, RESPONSE_KEY) == 4
+
+        await tags.publish(redis, [FILM])
+
+        assert await wait_deleted(redis, DETAIL_KEY, LIST_KEY, COUNT_KEY, RESPONSE_KEY)
+    finally:
+        await stop(task)
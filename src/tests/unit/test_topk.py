@@ -0,0 +1,47 @@
+import random
+
+from cache.topk import SpaceSaving
+
+
+def test_exact_below_capacity():
+    sketch = SpaceSaving(capacity=10)
+    for item in 'abcabca':
+        sketch.add(item)
+
+    assert sketch.top(2) == [('a', 3, 0), ('b', 2, 0)]
+
+
+def test_capacity_is_bounded():
+    sketch = SpaceSaving(capacity=5)
+    for i in range(100):
+        sketch.add(i)
+
+    assert len(sketch) == 5
+    assert len(sketch._heap) == 5
+
+
+def test_new_item_inherits_min_count_as_error():
+    sketch = SpaceSaving(capacity=2)
+    sketch.add('a', 5)
+    sketch.add('b', 2)
+    sketch.add('c')
+
+    assert dict((item, (count, error)) for item, count, error in sketch.top(2)) == {
+        'a': (5, 0),
+        'c': (3, 2),
+    }
+
+
+def test_heavy_hitters_survive_long_tail():
+    random.seed(0)
+    stream = ['hot1'] * 500 + ['hot2'] * 300 + [f'tail{i}' for i in range(2000)]
+    random.shuffle(stream)
+
+    sketch = SpaceSaving(capacity=50)
+    for item in stream:
+        sketch.add(item)
+
+    top = sketch.top(2)
+    assert [item for item, _, _ in top] == ['hot1', 'hot2']
+    for item, count, error in top:
+        assert count - error <= stream.count(item) <= count
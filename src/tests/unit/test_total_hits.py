@@ -0,0 +1,106 @@
+from uuid import uuid4
+
+import pytest
+
+from core.config import settings
+from db_managers.abstract_manager import AbstractDBManager
+from models.genre import GenreShort
+from services.genre import GenreService
+from services.node import NodeService
+
+pytestmark = pytest.mark.asyncio
+
+QUERY = {'query': {'match_all': {}}, 'size': 2}
+
+
+class FakeDBManager(AbstractDBManager):
+    """Индекс из total документов, search_all отдает страницу из двух."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.queries = []
+        self.counts = []
+
+    async def get(self, table_name, object_id, model):
+        return None
+
+    async def get_many(self, table_name, object_ids, model):
+        return [None] * len(object_ids)
+
+    async def search_all(self, table_name, model, query):
+        self.queries.append(query)
+        track = query.get('track_total_hits')
+        if track is False:
+            total = None
+        elif track is True:
+            total = self.total
+        else:
+            total = min(self.total, track)
+        page = [model(id=uuid4(), name='genre') for _ in range(2)]
+        return page, total, ['genre']
+
+    async def count(self, table_name, query):
+        self.counts.append(query)
+        return self.total
+
+    async def search_many(self, table_name, model, queries):
+        return [await self.search_all(table_name, model, query) for query in queries]
+
+
+class Service(NodeService):
+    Node = GenreShort
+    index = 'genres'
+
+
+@pytest.fixture
+def total_hits():
+    mode, cap = settings.total_hits.mode, settings.total_hits.cap
+    yield settings.total_hits
+    settings.total_hits.mode, settings.total_hits.cap = mode, cap
+
+
+async def test_capped_count_comes_with_the_page(total_hits):
+    total_hits.mode, total_hits.cap = 'capped', 5
+    db_manager = FakeDBManager(total=7)
+
+    models, total, _ = await Service(db_manager)._get_from_elastic(QUERY)
+
+    assert len(models) == 2
+    assert total == 5
+    assert db_manager.queries[0]['track_total_hits'] == 5
+    assert db_manager.counts == []
+
+
+async def test_exact_mode_per_call(total_hits):
+    total_hits.mode = 'capped'
+    db_manager = FakeDBManager(total=7)
+
+    _, total, _ = await Service(db_manager)._get_from_elastic(QUERY, total_hits='exact')
+
+    assert total == 7
+    assert db_manager.queries[0]['track_total_hits'] is True
+
+
+async def test_off_mode_pages_share_one_count(total_hits):
+    total_hits.mode = 'off'
+    db_manager = FakeDBManager(total=7)
+    service = Service(db_manager)
+
+    _, first, _ = await service._get_from_elastic(QUERY)
+    _, second, _ = await service._get_from_elastic({**QUERY, 'search_after': ['genre']})
+
+    assert first == second == 7
+    assert all(query['track_total_hits'] is False for query in db_manager.queries)
+    # Второй странице количество досталось из кэша
+    assert db_manager.counts == [QUERY['query']]
+
+
+async def test_genres_are_counted_exactly(total_hits):
+    total_hits.mode = 'off'
+    db_manager = FakeDBManager(total=7)
+
+    genres = await GenreService(db_manager).get_genres(size=2)
+
+    assert genres.count == 7
+    assert db_manager.queries[0]['track_total_hits'] is True
+    assert db_manager.counts == []
@@ -0,0 +1,50 @@
+from uuid import UUID
+
+import pytest
+
+from db_managers.abstract_manager import DBManagerError
+from db_managers.es_manager import ESDBManager
+from models.genre import Genre
+
+GENRE = {'id': '120a21cf-9097-479e-904a-13dd7198c1dd', 'name': 'Adventure', 'films_count': 1, 'description': ''}
+# Расхождение схемы: нет обязательного поля
+BROKEN = {'id': '120a21cf-9097-479e-904a-13dd7198c1de', 'name': 'Drama', 'description': ''}
+
+
+def test_trusted_documents_are_constructed():
+    db_manager = ESDBManager(elastic=None, trusted=['genres'], validate_rate=0.0)
+
+    genre = db_manager._parse('genres', Genre, [BROKEN])[0]
+
+    # Без проверки ошибку не заметить
+    assert genre.name == 'Drama'
+
+
+def test_sampled_validation_returns_validated_models():
+    db_manager = ESDBManager(elastic=None, trusted=['genres'], validate_rate=1.0)
+
+    genre = db_manager._parse('genres', Genre, [GENRE])[0]
+
+    assert genre == Genre.parse_obj(GENRE)
+    assert isinstance(genre.id, UUID)
+
+
+def test_failed_sample_is_not_served():
+    db_manager = ESDBManager(elastic=None, trusted=['genres'], validate_rate=1.0)
+
+    with pytest.raises(DBManagerError):
+        db_manager._parse('genres', Genre, [GENRE, BROKEN])
+
+
+@pytest.mark.asyncio
+async def test_failed_sample_fails_only_its_document():
+    class Elastic:
+        async def mget(self, **kwargs):
+            return {'docs': [{'found': True, '_source': GENRE}, {'found': True, '_source': BROKEN}]}
+
+    db_manager = ESDBManager(Elastic(), trusted=['genres'], validate_rate=1.0)
+
+    genre, error = await db_manager.get_many('genres', [GENRE['id'], BROKEN['id']], Genre)
+
+    assert genre == Genre.parse_obj(GENRE)
+    assert isinstance(error, DBManagerError)
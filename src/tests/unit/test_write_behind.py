@@ -0,0 +1,52 @@
+import pytest
+
+from cache.coder import BinaryCoder
+from cache.metrics import CacheMetrics
+from cache.write_behind import PendingWrite, WriteBehind
+from core.config import settings
+from models.node import Node
+
+pytestmark = pytest.mark.asyncio
+
+
+class Item(Node):
+    id: int
+
+
+@pytest.fixture
+def config():
+    saved = settings.cache_write_behind.copy()
+    config = settings.cache_write_behind
+    config.enabled = True
+    config.batch_size = 2
+    # Фоновая задача не успевает записать пачку до остановки
+    config.flush_interval = 60
+    yield config
+    settings.cache_write_behind = saved
+
+
+def entry(item_id: int) -> PendingWrite:
+    return PendingWrite(f'cache:wb:{item_id}', Item(id=item_id), BinaryCoder, 60, CacheMetrics('wb', 'get'))
+
+
+async def test_stop_flushes_queued_entries(redis, config):
+    write_behind = WriteBehind()
+    write_behind.start()
+    for item_id in range(5):
+        await write_behind.write(entry(item_id))
+    assert not await redis.exists(*(f'cache:wb:{item_id}' for item_id in range(5)))
+
+    await write_behind.stop()
+
+    for item_id in range(5):
+        value = await redis.get(f'cache:wb:{item_id}')
+        assert Item.parse_obj(BinaryCoder.decode(value)) == Item(id=item_id)
+    assert not write_behind.running
+
+
+async def test_write_is_inline_until_started(redis, config):
+    write_behind = WriteBehind()
+
+    await write_behind.write(entry(1))
+
+    assert await redis.exists('cache:wb:1')